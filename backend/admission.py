@@ -0,0 +1,98 @@
+import asyncio
+import time
+from collections import deque
+from typing import AsyncGenerator, Deque, Optional
+from metrics import ADMISSION_ACTIVE, ADMISSION_DECISIONS, ADMISSION_QUEUED, ADMISSION_WAIT_SECONDS
+
+POSITION_UPDATE_INTERVAL = 1.0
+
+
+class Ticket:
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._admitted_event = asyncio.Event()
+        self.admitted = False
+        self.released = False
+        self.created_at = time.monotonic()
+
+    async def wait(self, max_wait: float) -> AsyncGenerator[int, None]:
+        # Yields the 1-based queue position whenever it changes; returns once admitted or when max_wait runs out
+        deadline = self.created_at + max_wait
+        last = None
+        while not self.admitted:
+            position = self._controller.position(self)
+            if not position:
+                return
+            if position != last:
+                last = position
+                yield position
+            timeout = min(POSITION_UPDATE_INTERVAL, deadline - time.monotonic())
+            if timeout <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._admitted_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def close(self):
+        # Frees the slot, or leaves the queue if still waiting; safe to call more than once
+        if self.admitted and not self.released:
+            self.released = True
+            self._controller._release()
+        elif not self.admitted:
+            self._controller._abandon(self)
+
+
+class AdmissionController:
+    # Bounded pool of concurrent pipelines with a FIFO wait queue in front of it
+    def __init__(self, max_active: int, max_queue: int):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.active = 0
+        self._queue: Deque[Ticket] = deque()
+
+    def has_free_slot(self) -> bool:
+        return self.active < self.max_active and not self._queue
+
+    def enter(self) -> Optional[Ticket]:
+        ticket = Ticket(self)
+        if self.has_free_slot():
+            self._admit(ticket)
+            ADMISSION_DECISIONS.labels("admitted").inc()
+        elif len(self._queue) < self.max_queue:
+            self._queue.append(ticket)
+            ADMISSION_DECISIONS.labels("queued").inc()
+        else:
+            ADMISSION_DECISIONS.labels("rejected").inc()
+            return None
+        self._update_gauges()
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        try:
+            return self._queue.index(ticket) + 1
+        except ValueError:
+            return 0
+
+    def _admit(self, ticket: Ticket):
+        ticket.admitted = True
+        self.active += 1
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - ticket.created_at)
+        ticket._admitted_event.set()
+
+    def _release(self):
+        self.active -= 1
+        while self._queue and self.active < self.max_active:
+            self._admit(self._queue.popleft())
+        self._update_gauges()
+
+    def _abandon(self, ticket: Ticket):
+        try:
+            self._queue.remove(ticket)
+        except ValueError:
+            pass
+        self._update_gauges()
+
+    def _update_gauges(self):
+        ADMISSION_ACTIVE.set(self.active)
+        ADMISSION_QUEUED.set(len(self._queue))
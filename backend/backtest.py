@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import itertools
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from score_history import SIGNAL_INPUTS, SIGNAL_NAMES, SIGNAL_THRESHOLDS, load_history, signal_code
+
+# Replays generate_trading_signal over stored score history against OHLCV data so the
+# thresholds can be tuned offline. Everything is computed on whole columns at once.
+
+HOLD_BAND = 0.01  # a HOLD counts as a hit when the price moved less than this
+
+
+def vectorized_signals(history: pd.DataFrame, threshold_confidence: float = 0.6, positive_threshold: float = 60, negative_threshold: float = 40) -> np.ndarray:
+    # The live rule applied to whole columns, with the same fallbacks calculate_metrics uses; 1 / 0 / -1 per row
+    c = {name: history[name].fillna(default).to_numpy(np.float64) for name, default in SIGNAL_INPUTS.items()}
+    return signal_code(**c, threshold_confidence=threshold_confidence, positive_threshold=positive_threshold, negative_threshold=negative_threshold).astype(np.int8)
+
+def session_dates(index: pd.DatetimeIndex) -> np.ndarray:
+    if index.tz is None:
+        index = index.tz_localize("UTC")
+    return index.tz_convert("US/Eastern").normalize().tz_localize(None).to_numpy("datetime64[D]")
+
+def forward_returns(history: pd.DataFrame, ohlcv: pd.DataFrame, horizons: Sequence[int]) -> Dict[int, np.ndarray]:
+    # Enter at the last close known when the score was recorded, exit `h` bars later
+    closes = ohlcv["Close"].to_numpy(np.float64)
+    bar_dates = session_dates(pd.DatetimeIndex(ohlcv.index))
+    entry = np.searchsorted(bar_dates, session_dates(pd.DatetimeIndex(history.index)), side="right") - 1
+    returns = {}
+    for h in horizons:
+        exit_ = entry + h
+        valid = (entry >= 0) & (exit_ < len(closes))
+        out = np.full(len(history), np.nan)
+        out[valid] = closes[exit_[valid]] / closes[entry[valid]] - 1
+        returns[h] = out
+    return returns
+
+def summarize(signals: np.ndarray, returns: np.ndarray) -> Dict[str, dict]:
+    known = ~np.isnan(returns)
+    report = {}
+    for code, name in SIGNAL_NAMES.items():
+        mask = known & (signals == code)
+        count = int(mask.sum())
+        r = returns[mask]
+        hits = int((r > 0).sum() if code == 1 else (r < 0).sum() if code == -1 else (np.abs(r) < HOLD_BAND).sum())
+        report[name] = {
+            "count": count,
+            "hits": hits,
+            "hit_rate": round(hits / count, 4) if count else None,
+            "avg_return": round(float(r.mean()), 6) if count else None,
+        }
+    directional = known & (signals != 0)
+    d = int(directional.sum())
+    correct = int((np.sign(returns[directional]) == signals[directional]).sum())
+    report["directional"] = {"count": d, "hits": correct, "hit_rate": round(correct / d, 4) if d else None}
+    return report
+
+def daily_last(history: pd.DataFrame) -> pd.DataFrame:
+    # Several analyses on the same session collapse to the last one
+    return history.groupby(session_dates(pd.DatetimeIndex(history.index))).tail(1)
+
+def backtest(history: pd.DataFrame, ohlcv: pd.DataFrame, horizons: Sequence[int] = (1, 5), per_day: bool = True, **thresholds) -> dict:
+    if per_day and not history.empty:
+        history = daily_last(history)
+    params = {**SIGNAL_THRESHOLDS, **thresholds}
+    signals = vectorized_signals(history, **params)
+    returns = forward_returns(history, ohlcv, horizons)
+    return {
+        "thresholds": params,
+        "observations": len(history),
+        "horizons": {str(h): summarize(signals, r) for h, r in returns.items()},
+    }
+
+def sweep(history: pd.DataFrame, ohlcv: pd.DataFrame, grid: Dict[str, Iterable[float]], horizon: int = 5, per_day: bool = True, min_count: int = 5) -> List[dict]:
+    # Evaluates every threshold combination; forward returns are computed once and reused
+    if per_day and not history.empty:
+        history = daily_last(history)
+    returns = forward_returns(history, ohlcv, [horizon])[horizon]
+    names = list(grid)
+    results = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = {**SIGNAL_THRESHOLDS, **dict(zip(names, values))}
+        report = summarize(vectorized_signals(history, **params), returns)["directional"]
+        if report["count"] >= min_count:
+            results.append({**params, **report})
+    return sorted(results, key=lambda r: (r["hit_rate"], r["count"]), reverse=True)
+
+def fetch_ohlcv(ticker: str, start: datetime, end: datetime, horizon: int) -> pd.DataFrame:
+    import yfinance as yf
+
+    # Pad the end so the last observations still have `horizon` bars to exit on
+    return yf.Ticker(ticker).history(start=start.date(), end=(end + timedelta(days=horizon * 2 + 7)).date(), interval="1d")
+
+async def run_backtest(ticker: str, start: Optional[datetime] = None, end: Optional[datetime] = None, horizons: Sequence[int] = (1, 5), **thresholds) -> dict:
+    history = await load_history(ticker, start, end)
+    if history.empty:
+        return {"ticker": ticker.upper(), "observations": 0, "horizons": {}}
+    first, last = history.index[0].to_pydatetime(), history.index[-1].to_pydatetime()
+    ohlcv = await asyncio.to_thread(fetch_ohlcv, ticker, first - timedelta(days=7), last, max(horizons))
+    return {"ticker": ticker.upper(), "start": first.isoformat(), "end": last.isoformat(), **backtest(history, ohlcv, horizons, **thresholds)}
+
+
+def parse_range(value: str) -> List[float]:
+    # "40:70:5" -> 40, 45, ..., 70; "0.5,0.6" -> 0.5, 0.6
+    if ":" in value:
+        lo, hi, step = (float(x) for x in value.split(":"))
+        return [round(x, 6) for x in np.arange(lo, hi + step / 2, step)]
+    return [float(x) for x in value.split(",")]
+
+async def main(args):
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=args.days)
+    if not args.sweep:
+        report = await run_backtest(args.ticker, start, end, args.horizons)
+        print(json.dumps(report, indent=2))
+        return
+
+    history = await load_history(args.ticker, start, end)
+    if history.empty:
+        print(f"No score history for {args.ticker.upper()}")
+        return
+    first, last = history.index[0].to_pydatetime(), history.index[-1].to_pydatetime()
+    ohlcv = await asyncio.to_thread(fetch_ohlcv, args.ticker, first - timedelta(days=7), last, args.horizons[0])
+    grid = {
+        "positive_threshold": parse_range(args.positive),
+        "negative_threshold": parse_range(args.negative),
+        "threshold_confidence": parse_range(args.confidence),
+    }
+    for row in sweep(history, ohlcv, grid, horizon=args.horizons[0], min_count=args.min_count)[:args.top]:
+        print(json.dumps(row))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest trading signals over stored score history")
+    parser.add_argument("ticker")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--horizons", type=int, nargs="+", default=[1, 5], help="holding periods in trading days")
+    parser.add_argument("--sweep", action="store_true", help="grid-search thresholds on the first horizon")
+    parser.add_argument("--positive", default="50:80:5")
+    parser.add_argument("--negative", default="20:50:5")
+    parser.add_argument("--confidence", default="0.5:0.7:0.05")
+    parser.add_argument("--min-count", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
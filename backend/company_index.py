@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+import aiohttp
+from config import settings
+from database import _select, _select_all, _upsert
+from metrics import OUTBOUND_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Finnhub profile2 keys -> company_info columns
+PROFILE_COLUMNS = {
+    "ticker": "ticker",
+    "name": "name",
+    "country": "country",
+    "currency": "currency",
+    "estimateCurrency": "estimate_currency",
+    "exchange": "exchange",
+    "finnhubIndustry": "finnhub_industry",
+    "ipo": "ipo",
+    "logo": "logo",
+    "marketCapitalization": "market_capitalization",
+    "shareOutstanding": "share_outstanding",
+    "weburl": "weburl",
+}
+
+def profile_to_row(profile: dict) -> dict:
+    row = {column: profile.get(key) for key, column in PROFILE_COLUMNS.items()}
+    row["ticker"] = (row["ticker"] or "").upper()
+    row["ipo"] = row["ipo"] or None
+    for column in ("country", "currency", "exchange", "finnhub_industry"):
+        row[column] = row[column] or "Unknown"
+    row["market_capitalization"] = row["market_capitalization"] or 0
+    return row
+
+def row_to_company_info(row: dict) -> dict:
+    ticker = row.get("ticker")
+    return {
+        "name": row.get("name") or ticker,
+        "ticker": ticker,
+        "country": row.get("country") or "Unknown",
+        "industry": row.get("finnhub_industry") or "Unknown",
+        "exchange": row.get("exchange") or "Unknown",
+        "ipo": row.get("ipo") or "Unknown",
+        "marketCap": float(row.get("market_capitalization") or 0),
+        "url": row.get("weburl") or "",
+    }
+
+async def async_company_profile(ticker_symbol: str, session: aiohttp.ClientSession):
+    url = f"{settings.FINNHUB_API_URL}/stock/profile2?symbol={ticker_symbol}&token={settings.FINNHUB_API_KEY}"
+    with OUTBOUND_REQUEST_SECONDS.labels("finnhub").time():
+        async with session.get(url) as response:
+            if response.status == 200:
+                return await response.json()
+            else:
+                return None
+
+
+class CompanyIndex:
+    def __init__(self, prefetch_concurrency: int = 5):
+        self.prefetch_concurrency = prefetch_concurrency
+        self.loaded_at: Optional[datetime] = None
+        self._rows: Dict[str, dict] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._listeners: List[Callable[[List[dict]], None]] = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, ticker: str):
+        return ticker.upper() in self._rows
+
+    def get(self, ticker: str) -> Optional[dict]:
+        row = self._rows.get(ticker.upper())
+        return row_to_company_info(row) if row else None
+
+    def subscribe(self, listener: Callable[[List[dict]], None]):
+        self._listeners.append(listener)
+
+    def _store(self, rows: Iterable[dict]):
+        rows = [row for row in rows if row.get("ticker")]
+        for row in rows:
+            self._rows[row["ticker"].upper()] = row
+        for listener in self._listeners:
+            try:
+                listener(rows)
+            except Exception as e:
+                logger.error(f"Company index listener failed: {e}")
+
+    async def load(self):
+        rows = await _select_all("company_info", order="ticker")
+        self._rows = {}
+        self._store(rows)
+        self.loaded_at = datetime.now(timezone.utc)
+        logger.info(f"Company index loaded {len(self._rows)} profiles.")
+
+    async def _fetch_and_store(self, ticker: str, session: aiohttp.ClientSession) -> Optional[dict]:
+        profile = await async_company_profile(ticker, session)
+        if not profile or not profile.get("name"):
+            return None
+        row = profile_to_row(profile)
+        row["ticker"] = row["ticker"] or ticker
+        await _upsert("company_info", row)
+        self._store([row])
+        return row
+
+    async def fetch(self, ticker: str, session: aiohttp.ClientSession) -> Optional[dict]:
+        ticker = ticker.upper()
+        if ticker in self._rows:
+            return row_to_company_info(self._rows[ticker])
+
+        # Coalesce concurrent misses for the same ticker into one Finnhub call
+        future = self._inflight.get(ticker)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch_and_store(ticker, session))
+            self._inflight[ticker] = future
+            future.add_done_callback(lambda _: self._inflight.pop(ticker, None))
+        row = await asyncio.shield(future)
+        return row_to_company_info(row) if row else None
+
+    async def prefetch(self, tickers: List[str], session: aiohttp.ClientSession):
+        missing = sorted({t.upper() for t in tickers} - self._rows.keys())
+        if not missing:
+            return
+        res = await _select("company_info", in_filters=[("ticker", missing)])
+        self._store(res.data or [])
+
+        missing = [t for t in missing if t not in self._rows]
+        semaphore = asyncio.Semaphore(self.prefetch_concurrency)
+
+        async def fetch_one(ticker):
+            async with semaphore:
+                try:
+                    await self.fetch(ticker, session)
+                except Exception as e:
+                    logger.error(f"Error prefetching company profile for {ticker}: {e}")
+
+        await asyncio.gather(*(fetch_one(t) for t in missing))
+
+
+company_index = CompanyIndex()
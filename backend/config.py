@@ -19,10 +19,38 @@ class Settings(BaseSettings):
     REDDIT_CLIENT_SECRET: str
     REDDIT_USER_AGENT: str
     
+    FINNHUB_API_URL: str = "https://finnhub.io/api/v1"
+    ALPHA_VANTAGE_API_URL: str = "https://www.alphavantage.co/query"
+    OPENAI_BASE_URL: Optional[str] = None
+    BLUESKY_API_URL: str = "https://bsky.social/xrpc"
+    REDDIT_URL: str = "https://www.reddit.com"
+    REDDIT_OAUTH_URL: str = "https://oauth.reddit.com"
+
     PORT: int = 8000
     SENTIMENT_ANALYZER_URL: str = "http://localhost:8001"
     SENTIMENT_ANALYZER_MODEL: str = "ProsusAI/finbert"
+    SENTIMENT_HEALTH_RETRIES: int = 8
     FRONTEND_URL: str = "http://localhost:3000"
+    SUBREDDIT_CACHE_TTL: int = 24 * 60 * 60
+    COMPANY_INDEX_REFRESH_INTERVAL: int = 6 * 60 * 60
+    QUOTES_BROADCAST_INTERVAL: float = 15
+    ANALYSIS_CACHE_TTL: int = 60 * 60
+    ANALYSIS_CACHE_TTL_CLOSED: int = 4 * 60 * 60
+    ANALYSIS_CACHE_TTL_NON_TRADING: int = 12 * 60 * 60
+    SSE_HEARTBEAT_INTERVAL: float = 15
+    ANALYZE_MAX_CONCURRENCY: int = 8
+    ANALYZE_MAX_QUEUE: int = 32
+    ANALYZE_MAX_QUEUE_WAIT: float = 30
+    BATCH_MAX_CONCURRENCY: int = 4
+    BATCH_MAX_SYMBOLS: int = 50
+    JOBS_DB_PATH: str = "jobs.db"
+    CPU_POOL_WORKERS: Optional[int] = None  # defaults to one less than the CPU count, at most 4; 0 uses threads
+    LOOP_MONITOR_INTERVAL: float = 0.25
+    LOOP_STALL_THRESHOLD: float = 0.1
+    JOB_WORKERS: int = 2
+    JOB_STALE_AFTER: int = 60
+    JOB_MAX_ATTEMPTS: int = 3  # claims before a job whose worker keeps dying is failed
+    JOB_RETENTION: int = 24 * 60 * 60
     
     class Config:
         env_file = ".env"
@@ -1,43 +1,84 @@
-from supabase import create_client, Client
 from config import settings
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 import asyncio
+import threading
+from metrics import DB_CALL_SECONDS
 
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+_client = None
+_client_lock = threading.Lock()
 
-async def _select(table: str, columns: str = "*", filters: Optional[List] = None, order: Optional[str] = None, desc: bool = False, limit: int = None):
+def supabase_client():
+    # Built on first query (always inside a worker thread) so the supabase import stays off the startup path
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from supabase import create_client
+
+                _client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    return _client
+
+def _apply_filters(query_builder, filters: Optional[List] = None, in_filters: Optional[List] = None, range_filters: Optional[List] = None):
+    if filters:
+        for column, value in filters:
+            query_builder = query_builder.eq(column, value)
+    if in_filters:
+        for column, values in in_filters:
+            query_builder = query_builder.in_(column, list(values))
+    if range_filters:
+        # (column, "gte" | "gt" | "lte" | "lt", value)
+        for column, op, value in range_filters:
+            query_builder = getattr(query_builder, op)(column, value)
+    return query_builder
+
+async def _select(table: str, columns: str = "*", filters: Optional[List] = None, order: Union[str, List[str], None] = None, desc: bool = False, limit: int = None, in_filters: Optional[List] = None, range_filters: Optional[List] = None, or_filter: Optional[str] = None):
     def query():
-        query_builder = supabase.table(table).select(columns)
-        if filters:
-            for column, value in filters:
-                query_builder = query_builder.eq(column, value)
-        if order:
-            query_builder = query_builder.order(order, desc=desc)
+        query_builder = _apply_filters(supabase_client().table(table).select(columns), filters, in_filters, range_filters)
+        if or_filter:
+            query_builder = query_builder.or_(or_filter)
+        for column in ([order] if isinstance(order, str) else order or []):
+            query_builder = query_builder.order(column, desc=desc)
         if limit:
             query_builder = query_builder.limit(limit)
         return query_builder.execute()
 
-    res = await asyncio.to_thread(query)
+    with DB_CALL_SECONDS.labels(table, "select").time():
+        res = await asyncio.to_thread(query)
     return res
 
+async def _select_all(table: str, columns: str = "*", order: Optional[str] = None, page_size: int = 1000, filters: Optional[List] = None, range_filters: Optional[List] = None):
+    def query():
+        rows, start = [], 0
+        while True:
+            query_builder = _apply_filters(supabase_client().table(table).select(columns), filters, range_filters=range_filters)
+            if order:
+                query_builder = query_builder.order(order)
+            res = query_builder.range(start, start + page_size - 1).execute()
+            rows.extend(res.data or [])
+            if not res.data or len(res.data) < page_size:
+                return rows
+            start += page_size
+
+    with DB_CALL_SECONDS.labels(table, "select_all").time():
+        return await asyncio.to_thread(query)
+
 async def _insert(table: str, data: dict):
     def insert_fn():
-        return supabase.table(table).insert(data).execute()
-    res = await asyncio.to_thread(insert_fn)
+        return supabase_client().table(table).insert(data).execute()
+    with DB_CALL_SECONDS.labels(table, "insert").time():
+        res = await asyncio.to_thread(insert_fn)
     return res
 
 async def _upsert(table: str, data: List[dict]):
     def upsert_fn():
-        return supabase.table(table).upsert(data).execute()
-    res = await asyncio.to_thread(upsert_fn)
+        return supabase_client().table(table).upsert(data).execute()
+    with DB_CALL_SECONDS.labels(table, "upsert").time():
+        res = await asyncio.to_thread(upsert_fn)
     return res
 
-async def _delete(table: str, filters: Optional[List] = None):
+async def _delete(table: str, filters: Optional[List] = None, range_filters: Optional[List] = None):
     def delete_fn():
-        query_builder = supabase.table(table)
-        if filters:
-            for column, value in filters:
-                query_builder = query_builder.eq(column, value)
-        return query_builder.delete().execute()
-    res = await asyncio.to_thread(delete_fn)
+        return _apply_filters(supabase_client().table(table).delete(), filters, range_filters=range_filters).execute()
+    with DB_CALL_SECONDS.labels(table, "delete").time():
+        res = await asyncio.to_thread(delete_fn)
     return res
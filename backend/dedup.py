@@ -0,0 +1,103 @@
+import hashlib
+import re
+from typing import Callable, Dict, FrozenSet, Hashable, List, Optional, Tuple
+import numpy as np
+from metrics import DUPLICATES_DROPPED
+
+# Exact and near-duplicate filtering for posts and articles before they are scored.
+# Near duplicates are found with MinHash signatures bucketed into LSH bands; candidates
+# sharing a band are confirmed with the exact Jaccard similarity of their token sets.
+
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SIMILARITY_THRESHOLD = 0.8
+MIN_TOKENS = 4  # shorter texts only match exactly
+
+TOKEN_RE = re.compile(r"[a-z0-9$']+")
+NOISE_RE = re.compile(r"http\S+|@\w+")
+
+_rng = np.random.default_rng(0x5EED)
+PERM_A = _rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+PERM_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(NOISE_RE.sub(" ", (text or "").lower()))
+
+def token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "big")
+
+def minhash(tokens: FrozenSet[str]) -> np.ndarray:
+    hashes = np.fromiter((token_hash(t) for t in tokens), dtype=np.uint64, count=len(tokens))
+    # Multiply-add permutations; uint64 overflow wraps, which is what we want here
+    with np.errstate(over="ignore"):
+        return (hashes[:, None] * PERM_A + PERM_B).min(axis=0)
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class NearDuplicateIndex:
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self._bands: List[Dict[bytes, List[int]]] = [{} for _ in range(BANDS)]
+        self._sets: List[FrozenSet[str]] = []
+
+    @staticmethod
+    def _band_keys(signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [(band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+    def add_if_new(self, tokens: FrozenSet[str]) -> bool:
+        keys = self._band_keys(minhash(tokens))
+        checked = set()
+        for band, key in keys:
+            for i in self._bands[band].get(key, ()):
+                if i not in checked:
+                    checked.add(i)
+                    if jaccard(self._sets[i], tokens) >= self.threshold:
+                        return False
+        self._sets.append(tokens)
+        for band, key in keys:
+            self._bands[band].setdefault(key, []).append(len(self._sets) - 1)
+        return True
+
+
+class Deduplicator:
+    # Keeps the first copy of each item: same key (id/url), same normalized text, or a near-duplicate text
+    def __init__(self, source: str, threshold: float = SIMILARITY_THRESHOLD):
+        self.source = source
+        self._keys = set()
+        self._texts = set()
+        self._index = NearDuplicateIndex(threshold)
+
+    def seen_key(self, key: Optional[Hashable]) -> bool:
+        if not key:
+            return False
+        if key in self._keys:
+            return True
+        self._keys.add(key)
+        return False
+
+    def seen_text(self, text: str) -> bool:
+        tokens = tokenize(text)
+        normalized = " ".join(tokens)
+        if normalized in self._texts:
+            return True
+        token_set = frozenset(tokens)
+        if len(token_set) >= MIN_TOKENS and not self._index.add_if_new(token_set):
+            return True
+        if normalized:
+            self._texts.add(normalized)
+        return False
+
+    def is_duplicate(self, key: Optional[Hashable], text: str) -> bool:
+        if self.seen_key(key) or self.seen_text(text):
+            DUPLICATES_DROPPED.labels(self.source).inc()
+            return True
+        return False
+
+
+def dedupe(items: List[dict], source: str, text: Callable[[dict], str], key: Callable[[dict], Optional[Hashable]] = lambda item: item.get("url")) -> List[dict]:
+    dedup = Deduplicator(source)
+    return [item for item in items if not dedup.is_duplicate(key(item), text(item))]
@@ -1,48 +1,120 @@
-import pytz
+import asyncio
 import json
 import aiohttp
-from openai import AsyncOpenAI
-import numpy as np
-import pandas as pd
 from typing import List, Optional, Dict, Any
 from config import settings
+from metrics import OUTBOUND_REQUEST_SECONDS
+from dedup import Deduplicator
+from score_history import SIGNAL_INPUTS, SIGNAL_NAMES, SIGNAL_THRESHOLDS, signal_code
+from social import bluesky_session, reddit_connector
 from pydantic import BaseModel
-from datetime import datetime, time, timedelta, timezone, date
-import asyncpraw
+from datetime import datetime, timedelta, timezone, date
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DETAIL_SECTIONS = ("historical_data", "articles", "posts", "top_posts")
 
 class AnalyzeItem(BaseModel):
     symbol: str
     force_refresh: Optional[bool] = False
+    profile: Optional[str] = "full"  # "slim" sends the summary first and detail sections as later events
+    sections: Optional[List[str]] = None
 
-def is_market_open():
-    eastern = pytz.timezone("US/Eastern")
-    now_eastern = datetime.now(eastern)
-    market_open = time(9, 30)
-    market_close = time(16, 0)
-    return now_eastern.weekday() < 5 and market_open <= now_eastern.time() <= market_close
+class BatchAnalyzeItem(BaseModel):
+    symbols: List[str]
+    force_refresh: Optional[bool] = False
+    format: Optional[str] = "sse"
+    profile: Optional[str] = "full"
 
 def json_serial(obj):
     if isinstance(obj, (datetime, date)):
         return obj.isoformat()
     raise TypeError(f"Type {type(obj)} not serializable")
 
-def send_sse_message(message, event_type="message"):
-    return f"event: {event_type}\ndata: {json.dumps(message, default=json_serial)}\n\n"
+def dumps(message) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(message, default=json_serial, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(message, default=json_serial, separators=(",", ":")).encode()
 
-async def fetch_alpha_vantage_trending(session):
-    url = f"https://www.alphavantage.co/query?function=TOP_GAINERS_LOSERS&apikey={settings.ALPHA_VANTAGE_API_KEY}"
-    try:
-        async with session.get(url) as response:
-            if response.status != 200:
-                print(f"Alpha Vantage API returned status {response.status}")
-                return {"top_gainers": [], "top_losers": [], "most_actively_traded": []}
-            data = await response.json()
+def send_sse_message(message, event_type="message", event_id=None) -> bytes:
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{id_line}event: {event_type}\ndata: ".encode() + dumps(message) + b"\n\n"
+
+def send_ndjson_message(message) -> bytes:
+    return dumps(message) + b"\n"
 
-            for k in ("top_gainers", "top_losers", "most_actively_traded"):
-                data[k] = data.get(k, [])[:5]
+GZIP_THREAD_THRESHOLD = 64 * 1024
 
-            del data["metadata"]
-            return data
+def gzip_chunk(compressor, chunk: bytes) -> bytes:
+    return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+async def gzip_stream(chunks):
+    # Flush after every chunk so compressed events still reach the client immediately
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        # zlib releases the GIL, so large result events compress in a thread without stalling the loop
+        if len(chunk) >= GZIP_THREAD_THRESHOLD:
+            yield await asyncio.to_thread(gzip_chunk, compressor, chunk)
+        else:
+            yield gzip_chunk(compressor, chunk)
+    yield compressor.flush()
+
+def slim_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    financial_data = {k: v for k, v in (result.get("financial_data") or {}).items() if k != "historical_data"}
+    news_data = result.get("news_data") or {}
+    social_data = result.get("social_data") or {}
+    return {
+        "ticker": result.get("ticker"),
+        "last_run": result.get("last_run"),
+        "company_info": result.get("company_info"),
+        "scores": result.get("scores"),
+        "expanded_data": result.get("expanded_data"),
+        "financial_data": financial_data,
+        "news_data": {
+            "avg_sentiment": news_data.get("avg_sentiment", 0),
+            "article_count": len(news_data.get("articles") or []),
+        },
+        "social_data": {
+            "avg_sentiment": social_data.get("avg_sentiment", 0),
+            "total_posts": social_data.get("total_posts", 0),
+        },
+    }
+
+def detail_section(result: Dict[str, Any], section: str):
+    if section == "historical_data":
+        return (result.get("financial_data") or {}).get("historical_data", {})
+    if section == "articles":
+        return (result.get("news_data") or {}).get("articles", [])
+    posts = (result.get("social_data") or {}).get("posts", [])
+    if section == "posts":
+        return posts
+    if section == "top_posts":
+        # Indices into the posts section instead of duplicated post bodies
+        key = lambda post: (post.get("url"), post.get("username"), post.get("created_at"))
+        index = {key(post): i for i, post in enumerate(posts)}
+        top_posts = (result.get("social_data") or {}).get("top_posts", [])
+        return [index.get(key(post)) for post in top_posts]
+    raise KeyError(section)
+
+async def fetch_alpha_vantage_trending(session):
+    url = f"{settings.ALPHA_VANTAGE_API_URL}?function=TOP_GAINERS_LOSERS&apikey={settings.ALPHA_VANTAGE_API_KEY}"
+    try:
+        with OUTBOUND_REQUEST_SECONDS.labels("alphavantage").time():
+            async with session.get(url) as response:
+                if response.status != 200:
+                    print(f"Alpha Vantage API returned status {response.status}")
+                    return {"top_gainers": [], "top_losers": [], "most_actively_traded": []}
+                data = await response.json()
+
+                for k in ("top_gainers", "top_losers", "most_actively_traded"):
+                    data[k] = data.get(k, [])[:5]
+
+                del data["metadata"]
+                return data
     except Exception as e:
         print(f"Error fetching Alpha Vantage trending: {e}")
         return {"top_gainers": [], "top_losers": [], "most_actively_traded": []}
@@ -57,16 +129,19 @@ async def expand_keywords_and_generate_queries(company_name: str, industry: str)
     )
 
     try:
-        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You will generate queries for social media news and updates about the company."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=800
-        )
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+        with OUTBOUND_REQUEST_SECONDS.labels("openai").time():
+            response = await client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": "You will generate queries for social media news and updates about the company."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=800
+            )
 
         content = response.choices[0].message.content
         qs = json.loads(content)
@@ -76,32 +151,45 @@ async def expand_keywords_and_generate_queries(company_name: str, industry: str)
         print(f"OpenAI expansion failed: {e}")
         return {"search_queries": default_queries}
 
-async def fetch_reddit_posts(company_name: str, search_queries: List[str], analyze_sentiment, limit: int = 30):
+async def score_posts(posts: List[dict], analyze_sentiment, text_key: str = "text", keep_text: bool = True):
+    results = await asyncio.gather(*(analyze_sentiment(post[text_key]) for post in posts))
+    for post, (sentiment, label, confidence) in zip(posts, results):
+        post.update({
+            "sentiment": sentiment,
+            "label": label,
+            "confidence": confidence
+        })
+        if not keep_text:
+            post.pop(text_key)
+    return posts
+
+async def fetch_reddit_posts(company_name: str, search_queries: List[str], analyze_sentiment, limit: int = 30, progress=None):
     posts, min_posts_target = [], 20
+    seen = Deduplicator("reddit")
     subreddits = ["stocks", "investing", "wallstreetbets", "StockMarket", "finance", "economy", "business"]
 
     try:
-        async with asyncpraw.Reddit(client_id=settings.REDDIT_CLIENT_ID, client_secret=settings.REDDIT_CLIENT_SECRET, user_agent=settings.REDDIT_USER_AGENT) as reddit:
-            try: # Try to insert the company's own subreddit if it exists.
-                company_subreddit = await reddit.subreddit(company_name.lower())
-                _ = company_subreddit.created_utc
-                subreddits.insert(0, company_name.lower())
-            except Exception:
-                pass
+        reddit = reddit_connector.client
+        if reddit is None:
+            raise RuntimeError("Reddit client is not initialized")
+        if await reddit_connector.subreddit_exists(company_name): # Search the company's own subreddit first if it exists.
+            subreddits.insert(0, company_name.lower())
 
-            one_week_ago = (datetime.now(timezone.utc) - timedelta(days=7)).timestamp()
+        one_week_ago = (datetime.now(timezone.utc) - timedelta(days=7)).timestamp()
 
-            for subreddit_name in subreddits:
-                if len(posts) >= min_posts_target:
-                    break
-                try:
-                    subreddit = await reddit.subreddit(subreddit_name)
-                    for query in search_queries:
+        for subreddit_name in subreddits:
+            if len(posts) >= min_posts_target:
+                break
+            try:
+                subreddit = await reddit.subreddit(subreddit_name)
+                for query in search_queries:
+                    with OUTBOUND_REQUEST_SECONDS.labels("reddit").time():
                         async for submission in subreddit.search(query, sort="new", time_filter="week", limit=limit):
-                            if submission.created_utc < one_week_ago:
+                            if submission.created_utc < one_week_ago or seen.is_duplicate(submission.id, submission.title + " " + (submission.selftext or "")):
                                 continue
-                            post = {
+                            posts.append({
                                 "platform": "Reddit",
+                                "id": submission.id,
                                 "title": submission.title,
                                 "description": (submission.selftext or "")[:512],
                                 "text": submission.title + " " + (submission.selftext or ""),
@@ -114,82 +202,82 @@ async def fetch_reddit_posts(company_name: str, search_queries: List[str], analy
                                 "engagement": submission.score + submission.num_comments,
                                 "url": f"https://www.reddit.com{submission.permalink}",
                                 "subreddit": subreddit.display_name
-                            }
-                            sentiment, label, confidence = await analyze_sentiment(post["text"])
-                            post.update({
-                                "sentiment": sentiment,
-                                "label": label,
-                                "confidence": confidence
                             })
-                            post.pop("text")
-                            posts.append(post)
-                        if len(posts) >= min_posts_target:
-                            break
+                    if progress:
+                        progress.emit(f"Collected {len(posts)} Reddit posts", platform="Reddit", collected=len(posts))
                     if len(posts) >= min_posts_target:
                         break
-                except Exception as e:
-                    print(f"Subreddit {subreddit_name} error: {e}")
+                if len(posts) >= min_posts_target:
+                    break
+            except Exception as e:
+                print(f"Subreddit {subreddit_name} error: {e}")
+        posts = await score_posts(posts, analyze_sentiment, keep_text=False)
+        if progress:
+            progress.emit(f"Scored {len(posts)} Reddit posts", platform="Reddit", scored=len(posts))
         return posts
     except Exception as e:
         print(f"Reddit API/init error: {e}")
         return []
 
-async def fetch_bluesky_posts(company_name: str, search_queries: List[str], session: aiohttp.ClientSession, analyze_sentiment, max_results: int = 30):
-    BLUESKY_API = "https://bsky.social/xrpc"
+async def bluesky_search(session: aiohttp.ClientSession, params: dict) -> dict:
+    for attempt in range(2):
+        headers = await bluesky_session.headers()
+        with OUTBOUND_REQUEST_SECONDS.labels("bluesky").time():
+            async with session.get(f"{settings.BLUESKY_API_URL}/app.bsky.feed.searchPosts", headers=headers, params=params) as res:
+                if res.status == 401 and attempt == 0:
+                    bluesky_session.invalidate(headers)
+                    continue
+                res.raise_for_status()
+                return await res.json()
+
+async def fetch_bluesky_posts(company_name: str, search_queries: List[str], session: aiohttp.ClientSession, analyze_sentiment, max_results: int = 30, progress=None):
     posts = []
+    seen = Deduplicator("bluesky")
     try:
-        # Authenticate
-        async with session.post(f"{BLUESKY_API}/com.atproto.server.createSession", json={"identifier": settings.BSKY_IDENTIFIER, "password": settings.BSKY_PASSWORD}) as auth_resp:
-            auth_resp.raise_for_status()
-            auth_data = await auth_resp.json()
-            access_token = auth_data.get("accessJwt")
-            if not access_token:
-                print("Bluesky auth failed: no access token received")
-                return []
-            headers = {"Authorization": f"Bearer {access_token}"}
-
         for query in search_queries:
             try:
-                params = {"q": query, "limit": max_results}
-                async with session.get(f"{BLUESKY_API}/app.bsky.feed.searchPosts", headers=headers, params=params) as res:
-                    res.raise_for_status()
-                    data = await res.json()
-                    for post_data in data.get("posts", []):
-                        record = post_data.get("record", {})
-                        text = record.get("text", "")
-                        if not text:
-                            continue
-                        sentiment, label, confidence = await analyze_sentiment(text)
-                        created_at_str = post_data.get("indexedAt")
-                        try:
-                            created_at = datetime.fromisoformat(created_at_str.replace('Z', '+00:00')) if created_at_str else None
-                        except Exception:
-                            created_at = None
-                        author = post_data.get("author", {})
-                        username = author.get("handle", "unknown")
-                        posts.append({
-                            "platform": "Bluesky",
-                            "text": text,
-                            "created_at": created_at.isoformat() if created_at else None,
-                            "username": username,
-                            "likes": 0,   # Bluesky API may not provide these fields in this endpoint
-                            "comments": 0,
-                            "engagement": 0,
-                            "url": f"https://bsky.app/profile/{username}",
-                            "sentiment": sentiment,
-                            "label": label,
-                            "confidence": confidence
-                        })
+                data = await bluesky_search(session, {"q": query, "limit": max_results})
+                for post_data in data.get("posts", []):
+                    record = post_data.get("record", {})
+                    text = record.get("text", "")
+                    if not text or seen.is_duplicate(post_data.get("uri"), text):
+                        continue
+                    created_at_str = post_data.get("indexedAt")
+                    try:
+                        created_at = datetime.fromisoformat(created_at_str.replace('Z', '+00:00')) if created_at_str else None
+                    except Exception:
+                        created_at = None
+                    author = post_data.get("author", {})
+                    username = author.get("handle", "unknown")
+                    posts.append({
+                        "platform": "Bluesky",
+                        "id": post_data.get("uri"),
+                        "text": text,
+                        "created_at": created_at.isoformat() if created_at else None,
+                        "username": username,
+                        "likes": 0,   # Bluesky API may not provide these fields in this endpoint
+                        "comments": 0,
+                        "engagement": 0,
+                        "url": f"https://bsky.app/profile/{username}",
+                    })
+                if progress:
+                    progress.emit(f"Collected {len(posts)} Bluesky posts", platform="Bluesky", collected=len(posts))
             except Exception as e:
                 print(f"Bluesky search '{query}': {e}")
 
+        posts = await score_posts(posts, analyze_sentiment)
+        if progress:
+            progress.emit(f"Scored {len(posts)} Bluesky posts", platform="Bluesky", scored=len(posts))
         return posts
 
     except Exception as e:
-        print(f"Bluesky auth failed: {e}")
+        print(f"Bluesky search failed: {e}")
         return []
 
 def calculate_metrics(financial_data: Dict[str, Any], news_data: Dict[str, Any], social_data: Dict[str, Any]) -> Dict[str, Any]:
+    import numpy as np
+    import pandas as pd
+
     scores = {}
 
     # Financial Momentum (price, volume, volatility)
@@ -290,27 +378,13 @@ def calculate_metrics(financial_data: Dict[str, Any], news_data: Dict[str, Any],
         print(f"Sentiment-price divergence error: {e}")
         scores["sentiment_price_divergence"] = 0
 
-    scores["trading_signal"] = generate_trading_signal(financial_momentum=scores.get("financial_momentum", 50),news_sentiment=scores.get("news_sentiment", 50),news_confidence=scores.get("news_confidence", 0.5),social_buzz=scores.get("social_buzz", 0),social_confidence=scores.get("social_confidence", 0.5),sentiment_price_divergence=scores.get("sentiment_price_divergence", 0),threshold_confidence=0.6,positive_threshold=60,negative_threshold=40)
+    scores["trading_signal"] = generate_trading_signal(**{name: scores.get(name, default) for name, default in SIGNAL_INPUTS.items()}, **SIGNAL_THRESHOLDS)
 
     return scores
 
 def generate_trading_signal(financial_momentum: float,news_sentiment: float,news_confidence: float,social_buzz: float,social_confidence: float,sentiment_price_divergence: float,threshold_confidence: float = 0.6,positive_threshold: float = 60,negative_threshold: float = 40) -> str:
-    # Weighted composite sentiment/score
-    composite_sentiment = (
-        financial_momentum * 0.6 +
-        news_sentiment * 0.2 * news_confidence +
-        social_buzz * 0.2 * social_confidence
-    )
-    combined_confidence = (news_confidence + social_confidence + 1.0) / 3.0
-
-    if combined_confidence < threshold_confidence:
-        return "HOLD"
-    if composite_sentiment >= positive_threshold and sentiment_price_divergence < 0:
-        return "BUY"
-    elif composite_sentiment <= negative_threshold and sentiment_price_divergence > 0:
-        return "SELL"
-    else:
-        return "HOLD"
+    # The rule lives in score_history.signal_code so backtests replay exactly this signal
+    return SIGNAL_NAMES[int(signal_code(financial_momentum, news_sentiment, news_confidence, social_buzz, social_confidence, sentiment_price_divergence, threshold_confidence, positive_threshold, negative_threshold))]
 
 
 def flatten_nested_dict(d, parent_key='', sep='.'):
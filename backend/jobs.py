@@ -0,0 +1,319 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from typing import AsyncGenerator, Callable, Dict, List, Optional
+from helpers import json_serial
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+class ClaimLost(Exception):
+    pass
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    ticker TEXT NOT NULL,
+    force_refresh INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created_idx ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+class JobStore:
+    # SQLite-backed queue stand-in; every call opens its own connection so it is safe from to_thread workers
+    def __init__(self, path: str):
+        self.path = path
+        self._notify: Dict[str, List[asyncio.Event]] = {}
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _run(self, fn: Callable[[sqlite3.Connection], object]):
+        def call():
+            conn = self._connect()
+            try:
+                return fn(conn)
+            finally:
+                conn.close()
+        return asyncio.to_thread(call)
+
+    def _wake(self, job_id: str):
+        for event in self._notify.get(job_id, []):
+            event.set()
+
+    async def submit(self, ticker: str, force_refresh: bool = False) -> dict:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+
+        def insert(conn):
+            conn.execute(
+                "INSERT INTO jobs (id, ticker, force_refresh, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, ticker, int(bool(force_refresh)), now, now),
+            )
+        await self._run(insert)
+        return await self.get(job_id)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        def select(conn):
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return dict(row) if row else None
+        return await self._run(select)
+
+    async def claim(self, worker: str) -> Optional[dict]:
+        def claim_fn(conn):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+                if not row:
+                    conn.execute("COMMIT")
+                    return None
+                now = time.time()
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, updated_at = ?, heartbeat_at = ? WHERE id = ?",
+                    (worker, now, now, row["id"]),
+                )
+                conn.execute("COMMIT")
+                return dict(row)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return await self._run(claim_fn)
+
+    # heartbeat, finish and worker-owned events only apply while `worker` still holds the claim;
+    # they return False (or raise ClaimLost) once the reaper has handed the job to someone else
+    async def heartbeat(self, job_id: str, worker: str) -> bool:
+        def update(conn):
+            cursor = conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ? AND status = 'running'", (time.time(), job_id, worker)
+            )
+            return cursor.rowcount > 0
+        return await self._run(update)
+
+    async def finish(self, job_id: str, status: str, worker: str) -> bool:
+        def update(conn):
+            now = time.time()
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, heartbeat_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (status, now, now, job_id, worker),
+            )
+            return cursor.rowcount > 0
+        finished = await self._run(update)
+        self._wake(job_id)
+        return finished
+
+    async def requeue_stale(self, stale_after: float, max_attempts: int) -> Dict[str, List[str]]:
+        # Stale jobs go back to the queue until they have been claimed max_attempts times; a job that keeps
+        # killing its worker is failed instead. Events are written in the same transaction, so a heartbeat
+        # that lands first keeps its job and no stray event is recorded.
+        def requeue(conn):
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT id, attempts FROM jobs WHERE status = 'running' AND heartbeat_at < ?", (now - stale_after,)
+                ).fetchall()
+                outcome = {"requeued": [], "failed": []}
+                for row in rows:
+                    if row["attempts"] >= max_attempts:
+                        conn.execute("UPDATE jobs SET status = 'failed', updated_at = ? WHERE id = ?", (now, row["id"]))
+                        message = {"step": "complete", "status": "error", "message": f"Worker lost on all {row['attempts']} attempts. Job failed.", "data": None}
+                        outcome["failed"].append(row["id"])
+                    else:
+                        conn.execute("UPDATE jobs SET status = 'queued', worker = NULL, updated_at = ? WHERE id = ?", (now, row["id"]))
+                        message = {"step": "job", "status": "requeued", "message": "Worker lost. Job re-queued."}
+                        outcome["requeued"].append(row["id"])
+                    self._insert_event(conn, row["id"], json.dumps(message))
+                conn.execute("COMMIT")
+                return outcome
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        outcome = await self._run(requeue)
+        for job_id in outcome["requeued"] + outcome["failed"]:
+            self._wake(job_id)
+        return outcome
+
+    @staticmethod
+    def _insert_event(conn: sqlite3.Connection, job_id: str, payload: str) -> int:
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?", (job_id,)).fetchone()[0]
+        conn.execute("INSERT INTO job_events (job_id, seq, payload, created_at) VALUES (?, ?, ?, ?)", (job_id, seq, payload, time.time()))
+        return seq
+
+    async def append_event(self, job_id: str, message: dict, worker: Optional[str] = None) -> int:
+        def insert(conn):
+            # Encoded here, in the worker thread: a complete event carries the whole analysis
+            payload = json.dumps(message, default=json_serial)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if worker is not None:
+                    owner = conn.execute("SELECT worker, status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                    if not owner or owner["worker"] != worker or owner["status"] != "running":
+                        raise ClaimLost(job_id)
+                seq = self._insert_event(conn, job_id, payload)
+                conn.execute("COMMIT")
+                return seq
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        seq = await self._run(insert)
+        self._wake(job_id)
+        return seq
+
+    async def purge_finished(self, older_than: float) -> int:
+        def purge(conn):
+            cutoff = time.time() - older_than
+            placeholders = ",".join("?" * len(TERMINAL_STATUSES))
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    f"DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?)",
+                    (*TERMINAL_STATUSES, cutoff),
+                )
+                deleted = conn.execute(f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?", (*TERMINAL_STATUSES, cutoff)).rowcount
+                conn.execute("COMMIT")
+                return deleted
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return await self._run(purge)
+
+    async def events_after(self, job_id: str, after: int = 0) -> List[tuple]:
+        def select(conn):
+            rows = conn.execute("SELECT seq, payload FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)).fetchall()
+            return [(row["seq"], json.loads(row["payload"])) for row in rows]
+        return await self._run(select)
+
+    async def follow(self, job_id: str, after: int = 0, poll_interval: float = 1.0) -> AsyncGenerator[tuple, None]:
+        # In-process workers wake followers directly; the poll covers workers in other processes
+        event = asyncio.Event()
+        self._notify.setdefault(job_id, []).append(event)
+        try:
+            while True:
+                event.clear()
+                for seq, message in await self.events_after(job_id, after):
+                    after = seq
+                    yield seq, message
+                job = await self.get(job_id)
+                if not job or job["status"] in TERMINAL_STATUSES:
+                    for seq, message in await self.events_after(job_id, after):
+                        yield seq, message
+                    return
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            followers = self._notify.get(job_id, [])
+            followers.remove(event)
+            if not followers:
+                self._notify.pop(job_id, None)
+
+
+def worker_name(index: int) -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{index}"
+
+async def keep_claim(store: JobStore, job_id: str, worker: str, interval: float, run: asyncio.Task) -> bool:
+    # Heartbeats for as long as the job is claimed, however long a stage goes without yielding;
+    # returns True after cancelling the run if the claim was lost
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if not await store.heartbeat(job_id, worker):
+                logger.warning(f"Job {job_id} is no longer claimed by {worker}; stopping this run")
+                run.cancel()
+                return True
+        except Exception as e:
+            logger.error(f"Job worker {worker} failed to heartbeat job {job_id}: {e}")
+
+async def run_job(store: JobStore, worker: str, job: dict, pipeline) -> str:
+    job_id = job["id"]
+    status = "failed"
+    messages = pipeline(job["ticker"], force_refresh=bool(job["force_refresh"]))
+    try:
+        async for message in messages:
+            if message.get("step") == "heartbeat":
+                continue
+            await store.append_event(job_id, message, worker)
+            if message.get("step") == "complete" and message.get("status") == "success":
+                status = "succeeded"
+    except (asyncio.CancelledError, ClaimLost):
+        raise
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+        await store.append_event(job_id, {"step": "complete", "status": "error", "message": str(e), "data": None}, worker)
+    finally:
+        await messages.aclose()
+    return status
+
+async def run_worker(store: JobStore, worker: str, pipeline, poll_interval: float = 1.0, heartbeat_interval: float = 10.0):
+    logger.info(f"Job worker {worker} started.")
+    while True:
+        try:
+            job = await store.claim(worker)
+        except Exception as e:
+            logger.error(f"Job worker {worker} failed to claim a job: {e}")
+            job = None
+        if not job:
+            await asyncio.sleep(poll_interval)
+            continue
+
+        job_id = job["id"]
+        logger.info(f"Job worker {worker} running job {job_id} for {job['ticker']}")
+        run = asyncio.create_task(run_job(store, worker, job, pipeline))
+        keeper = asyncio.create_task(keep_claim(store, job_id, worker, heartbeat_interval, run))
+        try:
+            status = await run
+        except asyncio.CancelledError:
+            if not (keeper.done() and keeper.result()):
+                raise
+            continue
+        except ClaimLost:
+            logger.warning(f"Job {job_id} was re-queued while {worker} was running it; dropping this run")
+            continue
+        finally:
+            keeper.cancel()
+        try:
+            await store.finish(job_id, status, worker)
+        except Exception as e:
+            logger.error(f"Job worker {worker} failed to finish job {job_id}: {e}")
+
+async def run_reaper(store: JobStore, stale_after: float, retention: float, max_attempts: int, interval: float = 30.0):
+    while True:
+        try:
+            stale = await store.requeue_stale(stale_after, max_attempts)
+            if stale["requeued"]:
+                logger.warning(f"Re-queued {len(stale['requeued'])} stale jobs: {stale['requeued']}")
+            if stale["failed"]:
+                logger.error(f"Failed {len(stale['failed'])} jobs that lost their worker {max_attempts} times: {stale['failed']}")
+            purged = await store.purge_finished(retention)
+            if purged:
+                logger.info(f"Deleted {purged} finished jobs older than {retention:.0f} s")
+        except Exception as e:
+            logger.error(f"Error in job reaper: {e}")
+        await asyncio.sleep(interval)
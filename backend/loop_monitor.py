@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+from metrics import EVENT_LOOP_LAG_SECONDS, EVENT_LOOP_STALLS
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    # A ticker on the loop measures scheduling lag; a watchdog thread samples the loop thread's stack
+    # when a tick is overdue, so the log shows which step is holding the loop. Works under uvloop too.
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self._beat = time.monotonic()
+        self._reported = False
+        self._thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self.threshold <= 0 or self._task is not None:
+            return
+        self._thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._tick())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _tick(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            EVENT_LOOP_LAG_SECONDS.observe(max(0.0, now - expected))
+            self._beat = now
+            self._reported = False
+
+    def _watch(self):
+        while not self._stopped.wait(self.threshold / 2):
+            blocked = time.monotonic() - self._beat - self.interval
+            if blocked < self.threshold or self._reported:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            self._reported = True
+            EVENT_LOOP_STALLS.inc()
+            stack = "".join(traceback.format_stack(frame, limit=12))
+            logger.warning(f"Event loop blocked for over {blocked * 1000:.0f} ms, currently in:\n{stack}")
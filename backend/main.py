@@ -1,17 +1,33 @@
+import time as py_time
+startup_began = py_time.perf_counter()  # measured before the app's own imports for the startup report
 import asyncio
 import aiohttp
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, status, Request
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, status, Request, Query
+from fastapi.responses import StreamingResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
-import re
 from datetime import datetime, timedelta, timezone
 from typing import List, AsyncGenerator, Optional
 from database import _select, _insert, _upsert
 from config import settings
 from helpers import *
-import time as py_time
+from company_index import company_index
+from symbol_search import symbol_index
+from sentiment import sentiment_batcher
+from progress import ProgressChannel
+from metrics import PIPELINE_STAGE_SECONDS, OUTBOUND_REQUEST_SECONDS, CACHE_LOOKUPS, WEBSOCKET_CLIENTS, ADMISSION_DECISIONS, STARTUP_SECONDS
+from jobs import JobStore, run_worker, run_reaper, worker_name
+from score_history import record_scores, load_history, history_to_records
+from scored_items import SORT_COLUMNS, StaleCursor, page_items, prune_items, save_items, stored_news
+from market_calendar import market_calendar
+from dedup import dedupe
+from social import bluesky_session, reddit_connector
+from admission import AdmissionController
+from offload import CpuPool
+from loop_monitor import LoopMonitor
+from startup import warm_imports
 # from transformers import pipeline
 # import os
 
@@ -22,13 +38,21 @@ logger = logging.getLogger(__name__)
 # sentiment_analyzer = None
 PING_INTERVAL = 20
 POPULAR_TICKERS = ["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA", "NVDA", "META"]
+cpu_pool = CpuPool(settings.CPU_POOL_WORKERS, preload=("helpers", "pandas", "numpy"))
+loop_monitor = LoopMonitor(settings.LOOP_MONITOR_INTERVAL, settings.LOOP_STALL_THRESHOLD)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global sentiment_analyzer, popular_quotes_task
-    
+    global sentiment_analyzer, popular_quotes_task, company_index_task, job_tasks, startup_tasks
+    lifespan_began = py_time.perf_counter()
+    STARTUP_SECONDS.labels("imports").set(lifespan_began - startup_began)
+
     logger.info("HTTP session initialized.")
     app.state.aiohttp_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+    sentiment_batcher.session = app.state.aiohttp_session
+    bluesky_session.session = app.state.aiohttp_session
+    cpu_pool.start()
+    loop_monitor.start()
     # os.environ["TOKENIZERS_PARALLELISM"] = "false"
     # model_name = settings.SENTIMENT_ANALYZER_MODEL
     # logger.info(f"Loading sentiment analysis model {model_name}...")
@@ -39,33 +63,50 @@ async def lifespan(app: FastAPI):
     # )
     # logger.info("Model loaded successfully")
 
-    try:
-        async with app.state.aiohttp_session.get(settings.SENTIMENT_ANALYZER_URL + "/health") as resp:
-            if resp.status == 200:
-                health_data = await resp.json()
-                if health_data.get("success"):
-                    logger.info("Sentiment analyzer service healthy on startup.")
-                else:
-                    logger.warning("Sentiment analyzer service responded but is not healthy!")
-            else:
-                logger.error(f"Sentiment analyzer service /health returned status {resp.status}")
-    except Exception as e:
-        logger.error(f"Could not reach sentiment analyzer service: {e}")
+    # Nothing below waits on the network: probes, index loads and heavy imports run in the background
+    symbol_index.load_bundled()
+    company_index.subscribe(symbol_index.add_company_rows)
+    company_index_task = asyncio.create_task(refresh_company_index())
+    startup_tasks = [
+        asyncio.create_task(sentiment_batcher.probe(settings.SENTIMENT_HEALTH_RETRIES)),
+        asyncio.create_task(warm_imports()),
+    ]
 
- 
     popular_quotes_task = asyncio.create_task(broadcast_popular_quotes())
     logger.info("Popular quotes task started successfully!")
 
+    job_tasks = [asyncio.create_task(run_reaper(job_store, settings.JOB_STALE_AFTER, settings.JOB_RETENTION, settings.JOB_MAX_ATTEMPTS))]
+    job_tasks += [
+        asyncio.create_task(run_worker(job_store, worker_name(i), analysis_pipeline))
+        for i in range(settings.JOB_WORKERS)
+    ]
+    logger.info(f"Started {settings.JOB_WORKERS} in-process job workers.")
+
+    ready = py_time.perf_counter()
+    STARTUP_SECONDS.labels("lifespan").set(ready - lifespan_began)
+    logger.info(f"Ready in {(ready - startup_began) * 1000:.0f} ms (imports {(lifespan_began - startup_began) * 1000:.0f} ms)")
+
     try:
         yield
     finally:
+        await loop_monitor.stop()
+        cpu_pool.shutdown()
+        await reddit_connector.close()
         if app.state.aiohttp_session:
             await app.state.aiohttp_session.close()
         popular_quotes_task.cancel()
+        company_index_task.cancel()
+        for task in startup_tasks + job_tasks:
+            task.cancel()
+        await asyncio.gather(*startup_tasks, *job_tasks, return_exceptions=True)
         try:
             await popular_quotes_task
         except asyncio.CancelledError:
             logger.info("popular_quotes_task cancelled successfully")
+        try:
+            await company_index_task
+        except asyncio.CancelledError:
+            logger.info("company_index_task cancelled successfully")
 
 
 app = FastAPI(title="Hypr API", lifespan=lifespan)
@@ -79,55 +120,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-async def async_company_profile(ticker_symbol: str, session: aiohttp.ClientSession):
-    url = f"https://finnhub.io/api/v1/stock/profile2?symbol={ticker_symbol}&token={settings.FINNHUB_API_KEY}"
-    async with session.get(url) as response:
-        if response.status == 200:
-            return await response.json()
-        else:
-            return None
-
 async def get_company_info(ticker_symbol: str):
-    cached_profile_res = await _select("company_info", filters=[("ticker", ticker_symbol)], limit=1)
-    if cached_profile_res.data:
-        profile = cached_profile_res.data[0]
-        return {
-            "name": profile.get("name", ticker_symbol),
-            "ticker": profile.get("ticker", ticker_symbol),
-            "country": profile.get("country", "Unknown"),
-            "industry": profile.get("finnhubIndustry", "Unknown"),
-            "exchange": profile.get("exchange", "Unknown"),
-            "ipo": profile.get("ipo", "Unknown"),
-            "marketCap": float(profile.get("marketCapitalization", 0)),
-            "url": profile.get("weburl", "")
-        }
-    profile = await async_company_profile(ticker_symbol, app.state.aiohttp_session)
-    if not profile or not profile.get("name"):
+    ticker_symbol = ticker_symbol.upper()
+    company_info = company_index.get(ticker_symbol)
+    if company_info:
+        CACHE_LOOKUPS.labels("company_index", "hit").inc()
+        return company_info
+    CACHE_LOOKUPS.labels("company_index", "miss").inc()
+    company_info = await company_index.fetch(ticker_symbol, app.state.aiohttp_session)
+    if not company_info:
         logger.error(f"No profile data found for {ticker_symbol}")
         return {
             "error": f"Invalid ticker symbol: {ticker_symbol}",
             "name": ticker_symbol,
             "ticker": ticker_symbol
         }
-    await _upsert("company_info", profile)
+    return company_info
+
+
+def build_financial_data(ticker_symbol: str, hist, description: str):
+    if hist is None or hist.empty:
+        logger.error(f"No historical data found for {ticker_symbol}")
+        return {"ticker": ticker_symbol, "error": "No historical data found"}
+
+    latest = hist.iloc[-1]
+    prev_day = hist.iloc[-2]
+
+    returns = hist["Close"].pct_change()
+    volatility = returns.std() * (256 ** 0.5)  # annualized
+
+    # yf.download gives daily bars a naive index in exchange time; localizing those as UTC would shift every date back a day
+    index = hist.index if hist.index.tz is not None else hist.index.tz_localize("US/Eastern")
+    dates = index.tz_convert("US/Eastern").strftime("%Y-%m-%d")
+    rows = hist[["Open", "High", "Low", "Close", "Volume"]].astype(float).to_dict("records")
+    historical_data = dict(zip(dates, rows))
+
     return {
-        "name": profile.get("name", ticker_symbol),
-        "ticker": profile.get("ticker", ticker_symbol),
-        "country": profile.get("country", "Unknown"),
-        "industry": profile.get("finnhubIndustry", "Unknown"),
-        "exchange": profile.get("exchange", "Unknown"),
-        "ipo": profile.get("ipo", "Unknown"),
-        "marketCap": float(profile.get("marketCapitalization", 0)),
-        "url": profile.get("weburl", "")
+        "ticker": ticker_symbol,
+        "current_price": float(latest["Close"]),
+        "opening_price": float(latest["Open"]),
+        "daily_high": float(latest["High"]),
+        "daily_low": float(latest["Low"]),
+        "price_change": float(((latest["Close"] - prev_day["Close"]) / prev_day["Close"]) * 100),
+        "trading_volume": float(latest["Volume"]),
+        "volatility": float(volatility),
+        "historical_data": historical_data,
+        "description": description,
     }
 
-
 async def get_financial_data(ticker_symbol: str, period="2mo", interval="1d"):
     session: aiohttp.ClientSession = app.state.aiohttp_session
     if session is None:
         raise RuntimeError("HTTP session is not initialized")
     import yfinance as yf
-    from functools import partial
 
     try:
 
@@ -135,89 +180,54 @@ async def get_financial_data(ticker_symbol: str, period="2mo", interval="1d"):
             company = yf.Ticker(ticker_symbol)
             hist = company.history(period=period, interval=interval)
             description = company.info.get("longBusinessSummary", "No description available")
-            return hist, description
+            return build_financial_data(ticker_symbol, hist, description)
 
-        hist, description = await asyncio.to_thread(yf_fetch)
-        if hist.empty:
-            logger.error(f"No historical data found for {ticker_symbol}")
-            return {"ticker": ticker_symbol, "error": "No historical data found"}
-
-        latest = hist.iloc[-1]
-        prev_day = hist.iloc[-2]
-
-        returns = hist["Close"].pct_change()
-        volatility = returns.std() * (256 ** 0.5)  # annualized
-
-        historical_data = {}
-        for date, row in hist.iterrows():
-            if date.tzinfo is not None:
-                est_date = date.tz_convert("US/Eastern")
-            else:
-                est_date = date.tz_localize("UTC").tz_convert("US/Eastern")
-            date_str = est_date.strftime("%Y-%m-%d")
-            historical_data[date_str] = {
-                "Open": float(row["Open"]),
-                "High": float(row["High"]),
-                "Low": float(row["Low"]),
-                "Close": float(row["Close"]),
-                "Volume": float(row["Volume"]),
-            }
-
-        return {
-            "ticker": ticker_symbol,
-            "current_price": float(latest["Close"]),
-            "opening_price": float(latest["Open"]),
-            "daily_high": float(latest["High"]),
-            "daily_low": float(latest["Low"]),
-            "price_change": float(((latest["Close"] - prev_day["Close"]) / prev_day["Close"]) * 100),
-            "trading_volume": float(latest["Volume"]),
-            "volatility": float(volatility),
-            "historical_data": historical_data,
-            "description": description,
-        }
+        with OUTBOUND_REQUEST_SECONDS.labels("yfinance").time():
+            return await asyncio.to_thread(yf_fetch)
     except Exception as e:
         logger.error(f"Error retrieving financial data for {ticker_symbol}: {e}")
         return {"ticker": ticker_symbol, "error": str(e)}
 
+async def get_financial_data_batch(ticker_symbols: List[str], period="2mo", interval="1d"):
+    if not ticker_symbols:
+        return {}
+    import yfinance as yf
+
+    def yf_download():
+        return yf.download(ticker_symbols, period=period, interval=interval, group_by="ticker", threads=True, progress=False)
+
+    def yf_description(ticker_symbol):
+        try:
+            return yf.Ticker(ticker_symbol).info.get("longBusinessSummary", "No description available")
+        except Exception:
+            return "No description available"
 
-async def analyze_sentiment(text: str, session: aiohttp.ClientSession) -> tuple:
     try:
-        clean_text = re.sub(r"http\S+", "", text)
-        clean_text = re.sub(r"@\w+", "", clean_text).strip()
-        if not clean_text:
-            return 0.0, "neutral", 0.5
-        
-        # results = sentiment_analyzer(clean_text[:512])
-        start_time = py_time.perf_counter()
-        async with session.post(settings.SENTIMENT_ANALYZER_URL + "/analyze", json={"text": clean_text[:512]}) as resp:
-            if resp.status == 200:
-                results = await resp.json()
-                if not results.get("data"):
-                    return 0.0, "neutral", 0.5
-
-                # logger.info(results)
-                scores = {item["label"]: item["score"] for item in results.get("data", [[]])[0]}
-                pos = scores.get("positive", 0)
-                neg = scores.get("negative", 0)
-                neu = scores.get("neutral", 0)
-                sentiment = pos - neg
-                if sentiment > 0.1:
-                    label = "positive"
-                elif sentiment < -0.1:
-                    label = "negative"
-                else:
-                    label = "neutral"
-                confidence = max(pos, neg, neu)
-                elapsed_time = py_time.perf_counter() - start_time
-                logger.info(f"Sentiment analysis took {elapsed_time:.2f} seconds")
-                return sentiment, label, confidence
-            else:
-                return 0.0, "neutral", 0.5
+        with OUTBOUND_REQUEST_SECONDS.labels("yfinance").time():
+            hist_all, descriptions = await asyncio.gather(
+                asyncio.to_thread(yf_download),
+                asyncio.gather(*(asyncio.to_thread(yf_description, t) for t in ticker_symbols)),
+            )
     except Exception as e:
-        logger.error(f"Error analyzing sentiment for text. Error: {e}")
-        return 0.0, "neutral", 0.5
+        logger.error(f"Error retrieving batch financial data for {ticker_symbols}: {e}")
+        return {t: {"ticker": t, "error": str(e)} for t in ticker_symbols}
 
-async def get_news_and_analyze(ticker_symbol: str, company_name: Optional[str] = None, days: int = 2, max_articles: int = 20):
+    def build_all():
+        downloaded = set(hist_all.columns.get_level_values(0))
+        results = {}
+        for ticker_symbol, description in zip(ticker_symbols, descriptions):
+            try:
+                hist = hist_all[ticker_symbol].dropna(how="all") if ticker_symbol in downloaded else None
+                results[ticker_symbol] = build_financial_data(ticker_symbol, hist, description)
+            except Exception as e:
+                logger.error(f"Error retrieving financial data for {ticker_symbol}: {e}")
+                results[ticker_symbol] = {"ticker": ticker_symbol, "error": str(e)}
+        return results
+
+    return await asyncio.to_thread(build_all)
+
+
+async def get_news_and_analyze(ticker_symbol: str, company_name: Optional[str] = None, days: int = 2, max_articles: int = 20, progress: Optional[ProgressChannel] = None):
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
     from_date = start_date.strftime("%Y-%m-%d")
@@ -227,8 +237,8 @@ async def get_news_and_analyze(ticker_symbol: str, company_name: Optional[str] =
     async def process_article(article):
         try:
             text_to_analyze = article.get("headline", "") + " " + article.get("summary", "")
-            sentiment, label, confidence = await analyze_sentiment(text_to_analyze, app.state.aiohttp_session)
-            return {
+            sentiment, label, confidence = await sentiment_batcher.analyze(text_to_analyze)
+            article_data = {
                 "title": article.get("headline", ""),
                 "description": article.get("summary", ""),
                 "company_name": company_name,
@@ -240,6 +250,9 @@ async def get_news_and_analyze(ticker_symbol: str, company_name: Optional[str] =
                 "label": label,
                 "confidence": confidence,
             }
+            if progress:
+                progress.emit(f"Scored article: {article_data['title']}", item=article_data)
+            return article_data
         except Exception as e:
             logger.error(f"Error processing article: {e}")
             return None
@@ -247,19 +260,24 @@ async def get_news_and_analyze(ticker_symbol: str, company_name: Optional[str] =
     try:
         if ticker_symbol:
             async def get_news(session):
-                url = f"https://finnhub.io/api/v1/company-news?symbol={ticker_symbol}&from={from_date}&to={to_date}&token={settings.FINNHUB_API_KEY}"
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        return None
+                url = f"{settings.FINNHUB_API_URL}/company-news?symbol={ticker_symbol}&from={from_date}&to={to_date}&token={settings.FINNHUB_API_KEY}"
+                with OUTBOUND_REQUEST_SECONDS.labels("finnhub").time():
+                    async with session.get(url) as response:
+                        if response.status == 200:
+                            return await response.json()
+                        else:
+                            return None
 
             finnhub_news = await get_news(app.state.aiohttp_session)
+            # Syndicated copies share a headline/summary under different URLs
+            finnhub_news = dedupe(
+                finnhub_news, "news",
+                text=lambda article: article.get("headline", "") + " " + article.get("summary", ""),
+                key=lambda article: article.get("url") or article.get("id"),
+            )
 
-            for article in finnhub_news[:max_articles]:
-                article_data = await process_article(article)
-                if article_data:
-                    articles_data.append(article_data)
+            processed = await asyncio.gather(*(process_article(article) for article in finnhub_news[:max_articles]))
+            articles_data = [article_data for article_data in processed if article_data]
 
         total_weight = sum(a["confidence"] for a in articles_data if a["confidence"] > 0)
         if total_weight == 0:
@@ -271,11 +289,11 @@ async def get_news_and_analyze(ticker_symbol: str, company_name: Optional[str] =
         logger.error(f"Error fetching news: {e}")
         return {"articles": [], "avg_sentiment": 0}
 
-async def scrape_social_media(company_name: str, search_queries: List[str], max_results=30):
-    async def analyze_sentiment_wrapper(text: str):
-        return await analyze_sentiment(text, app.state.aiohttp_session)
-    reddit_posts = await fetch_reddit_posts(company_name=company_name, search_queries=search_queries, analyze_sentiment=analyze_sentiment_wrapper, limit=max_results)
-    bluesky_posts = await fetch_bluesky_posts(company_name=company_name, search_queries=search_queries, session=app.state.aiohttp_session, analyze_sentiment=analyze_sentiment_wrapper, max_results=max_results)
+async def scrape_social_media(company_name: str, search_queries: List[str], max_results=30, progress: Optional[ProgressChannel] = None):
+    reddit_posts, bluesky_posts = await asyncio.gather(
+        fetch_reddit_posts(company_name=company_name, search_queries=search_queries, analyze_sentiment=sentiment_batcher.analyze, limit=max_results, progress=progress),
+        fetch_bluesky_posts(company_name=company_name, search_queries=search_queries, session=app.state.aiohttp_session, analyze_sentiment=sentiment_batcher.analyze, max_results=max_results, progress=progress),
+    )
     all_posts = reddit_posts + bluesky_posts
 
     if not all_posts:
@@ -322,18 +340,19 @@ async def get_alpha_vantage_trending():
         return {"top_gainers": [], "top_losers": [], "most_actively_traded": []}
 
 async def fetch_quote(session: aiohttp.ClientSession, symbol: str):
-    url = f"https://finnhub.io/api/v1/quote?symbol={symbol}&token={settings.FINNHUB_API_KEY}"
-    async with session.get(url) as resp:
-        if resp.status != 200:
-            logger.warning(f"Failed to fetch quote for {symbol}: status {resp.status}")
-            return {"ticker": symbol, "price": None, "change_amount": None, "change_percentage": None}
-        data = await resp.json()
-        return {
-            "ticker": symbol,
-            "price": data.get("c"),
-            "change_amount": data.get("d"),
-            "change_percentage": data.get("dp"),
-        }
+    url = f"{settings.FINNHUB_API_URL}/quote?symbol={symbol}&token={settings.FINNHUB_API_KEY}"
+    with OUTBOUND_REQUEST_SECONDS.labels("finnhub").time():
+        async with session.get(url) as resp:
+            if resp.status != 200:
+                logger.warning(f"Failed to fetch quote for {symbol}: status {resp.status}")
+                return {"ticker": symbol, "price": None, "change_amount": None, "change_percentage": None}
+            data = await resp.json()
+            return {
+                "ticker": symbol,
+                "price": data.get("c"),
+                "change_amount": data.get("d"),
+                "change_percentage": data.get("dp"),
+            }
 
 async def fetch_popular_quotes(symbols: List[str]):
     session = app.state.aiohttp_session
@@ -361,20 +380,52 @@ async def fetch_cached_quotes_from_db():
     return result.data if result.data else []
 
 
+async def refresh_company_index():
+    try:
+        await company_index.load()
+        await company_index.prefetch(POPULAR_TICKERS, app.state.aiohttp_session)
+    except Exception as e:
+        logger.error(f"Could not load company index: {e}")
+    while True:
+        await asyncio.sleep(settings.COMPANY_INDEX_REFRESH_INTERVAL)
+        try:
+            await company_index.load()
+        except Exception as e:
+            logger.error(f"Error refreshing company index: {e}")
+
+
 clients = set()
+quote_snapshot = {"quotes": None, "fetched_at": None}
+quote_lock = asyncio.Lock()
+
+async def current_quotes():
+    # Live quotes at most once per broadcast interval in session. Off hours, one read after
+    # the close settles the snapshot and it is served from memory until the next open.
+    async with quote_lock:
+        now = datetime.now(timezone.utc)
+        fetched_at = quote_snapshot["fetched_at"]
+        if market_calendar.is_open(now):
+            if fetched_at is None or (now - fetched_at).total_seconds() >= settings.QUOTES_BROADCAST_INTERVAL:
+                quotes = await fetch_popular_quotes(POPULAR_TICKERS)
+                await save_quotes_to_db(quotes)
+                quote_snapshot.update(quotes=quotes, fetched_at=now)
+                logger.debug("Fetched live quotes.")
+        elif fetched_at is None:
+            quote_snapshot.update(quotes=await fetch_cached_quotes_from_db(), fetched_at=now)
+            logger.debug("Loaded cached quotes (market closed).")
+        elif fetched_at < market_calendar.last_close(now):
+            quotes = await fetch_popular_quotes(POPULAR_TICKERS)
+            await save_quotes_to_db(quotes)
+            quote_snapshot.update(quotes=quotes, fetched_at=now)
+            logger.debug("Fetched closing quotes.")
+        return quote_snapshot["quotes"]
 
 async def broadcast_popular_quotes():
     while True:
         try:
             if len(clients) > 0:
-                if is_market_open():
-                    quotes = await fetch_popular_quotes(POPULAR_TICKERS)
-                    await save_quotes_to_db(quotes)
-                    logger.info("Broadcasting live quotes.")
-                else:
-                    quotes = await fetch_cached_quotes_from_db()
-                    logger.info("Broadcasting cached quotes (market closed).")
-
+                quotes = await current_quotes()
+                logger.debug("Broadcasting quotes.")
                 disconnected = set()
                 for client in clients:
                     try:
@@ -384,172 +435,410 @@ async def broadcast_popular_quotes():
                         disconnected.add(client)
 
                 clients.difference_update(disconnected)
+                WEBSOCKET_CLIENTS.set(len(clients))
             else:
-                logger.info("No WebSocket clients connected.")
+                logger.debug("No WebSocket clients connected.")
         except Exception as e:
             logger.error(f"Error in quote broadcaster: {e}")
 
-        await asyncio.sleep(15)
+        # Sleeps until the next open when the market is closed; new clients get the snapshot on connect
+        await asyncio.sleep(market_calendar.quote_refresh_delay())
 
 @app.websocket("/ws/popular")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     clients.add(websocket)
+    WEBSOCKET_CLIENTS.set(len(clients))
     logger.info(f"WebSocket connection accepted. Total clients: {len(clients)}")
+    try:
+        await websocket.send_json({"type": "quotes", "data": await current_quotes()})
+    except Exception as e:
+        logger.warning(f"Failed to send initial quotes: {e}")
 
     try:
         while True:
             await websocket.receive_text()  # Keep connection alive, ignoring messages
     except WebSocketDisconnect:
-        clients.remove(websocket)
+        clients.discard(websocket)
+        WEBSOCKET_CLIENTS.set(len(clients))
         logger.info(f"WebSocket disconnected. Total clients: {len(clients)}")
 
 
 @app.get("/popular")
 async def get_popular_quotes():
-    if is_market_open():
-        quotes = await fetch_popular_quotes(POPULAR_TICKERS)
-        await save_quotes_to_db(quotes)
-        logger.info("Providing live quotes.")
-    else:
-        quotes = await fetch_cached_quotes_from_db()
-        logger.info("Providing cached quotes (market closed).")
-    return quotes
-
-
-@app.post("/analyze")
-async def analyze(data: AnalyzeItem):
-    if not data or not data.symbol:
-        raise HTTPException(status_code=400, detail="No symbol provided")
-    ticker = data.symbol.upper()
-    force_refresh = data.force_refresh
-    logger.info(f"Starting analysis for {ticker} (force_refresh={force_refresh})")
-
-    async def generate() -> AsyncGenerator[str, None]:
-        try:
-            now_utc = datetime.now(timezone.utc)
+    return await current_quotes()
+
+
+def cache_is_fresh(row: dict, now_utc: datetime) -> bool:
+    # A result scored by a different sentiment model version is stale regardless of age
+    current_model = sentiment_batcher.model_version()
+    cached_model = (row.get("scores") or {}).get("sentiment_model")
+    if current_model and cached_model and cached_model != current_model:
+        return False
+    return market_calendar.is_fresh(row["last_run"], now_utc)
+
+def shed_messages(ticker: str, cached_row: Optional[dict]) -> List[dict]:
+    if cached_row:
+        ADMISSION_DECISIONS.labels("served_stale").inc()
+        # One event carries the row, so an overloaded server does not send its largest payload twice
+        return [{"step": "complete", "status": "success", "message": "Server is busy; showing the last analysis instead of re-running it.", "data": cached_row, "stale": True}]
+    logger.warning(f"Shedding analysis for {ticker}: no free slot and no cached result")
+    return [{"step": "complete", "status": "error", "message": "Server is busy, please try again shortly.", "data": None, "retry_after": settings.ANALYZE_MAX_QUEUE_WAIT}]
+
+async def analysis_pipeline(ticker: str, force_refresh: bool = False, cached_row: Optional[dict] = None, financial_data: Optional[dict] = None, admission: Optional[AdmissionController] = None) -> AsyncGenerator[dict, None]:
+    ticket = None
+    try:
+        now_utc = datetime.now(timezone.utc)
+        if cached_row is None:
             # Check cache asynchronously
             cache_result = await _select(
                 "data", filters=[("company_info->>ticker", ticker)], order="last_run", desc=True, limit=1
             )
+            cached_row = cache_result.data[0] if cache_result.data else None
+
+        # Cache valid?
+        stale_row = None
+        if not force_refresh and cached_row:
+            if cache_is_fresh(cached_row, now_utc):
+                CACHE_LOOKUPS.labels("analysis", "hit").inc()
+                yield {"step": "cache", "status": "success", "message": "Using cached data."}
+                yield {"step": "complete", "status": "success", "data": cached_row}
+                return
+            else:
+                CACHE_LOOKUPS.labels("analysis", "stale").inc()
+                stale_row = cached_row
+        else:
+            CACHE_LOOKUPS.labels("analysis", "miss").inc()
+
+        # Only cache misses and refreshes take a pipeline slot; a stale row is served as-is rather than queued
+        if admission is not None:
+            ticket = None if stale_row and not admission.has_free_slot() else admission.enter()
+            if ticket is None:
+                for message in shed_messages(ticker, cached_row):
+                    yield message
+                return
+            async for position in ticket.wait(settings.ANALYZE_MAX_QUEUE_WAIT):
+                yield {"step": "queue", "status": "waiting", "position": position, "message": f"Waiting for a free slot (position {position} in queue)"}
+            if not ticket.admitted:
+                ADMISSION_DECISIONS.labels("timed_out").inc()
+                for message in shed_messages(ticker, cached_row):
+                    yield message
+                return
+
+        # Decided to re-run, so the stale row is shown while the fresh one is built
+        if stale_row:
+            yield {"step": "cache", "status": "warning", "message": "Cache expired. Re-running analysis.", "data": stale_row}
 
-            # Cache valid?
-            if not force_refresh and cache_result.data and len(cache_result.data) > 0:
-                last_run_str = cache_result.data[0]["last_run"]
-                last_run_time = datetime.fromisoformat(last_run_str)
-                if now_utc - last_run_time < timedelta(hours=1):
-                    yield send_sse_message(
-                        {"step": "cache", "status": "success", "message": "Using cached data."}
-                    )
-                    yield send_sse_message({"step": "complete", "status": "success", "data": cache_result.data[0]})
-                    return
-                else:
-                    yield send_sse_message(
-                        {"step": "cache", "status": "warning", "message": "Cache expired. Re-running analysis.", "data": cache_result.data[0]}
-                    )
-
-            # step 1: company info
-            yield send_sse_message({"step": "company_info", "status": "started", "message": "Fetching company info"})
+        # step 1: company info
+        yield {"step": "company_info", "status": "started", "message": "Fetching company info"}
+        with PIPELINE_STAGE_SECONDS.labels("company_info").time():
             company_info = await get_company_info(ticker)
-            if "error" in company_info:
-                yield send_sse_message({"step": "company_info", "status": "error", "message": company_info["error"]})
-                return
+        if "error" in company_info:
+            yield {"step": "company_info", "status": "error", "message": company_info["error"]}
+            return
 
-            yield send_sse_message({"step": "company_info", "status": "success", "message": f"Got company info for {company_info['name']}"})
+        yield {"step": "company_info", "status": "success", "message": f"Got company info for {company_info['name']}"}
 
-            # step 2: financial data
-            yield send_sse_message({"step": "financial_data", "status": "started", "message": "Fetching financial data"})
-            financial_data = await get_financial_data(ticker, period="2mo")
-            if "error" in financial_data:
-                yield send_sse_message({"step": "financial_data", "status": "error", "message": financial_data["error"]})
-                return
+        # step 2: financial data
+        yield {"step": "financial_data", "status": "started", "message": "Fetching financial data"}
+        if financial_data is None:
+            with PIPELINE_STAGE_SECONDS.labels("financial_data").time():
+                financial_data = await get_financial_data(ticker, period="2mo")
+        if "error" in financial_data:
+            yield {"step": "financial_data", "status": "error", "message": financial_data["error"]}
+            return
 
-            yield send_sse_message({"step": "financial_data", "status": "success", "message": "Got financial data"})
+        yield {"step": "financial_data", "status": "success", "message": "Got financial data"}
 
-            # step 3: news and analyze
-            yield send_sse_message({"step": "news", "status": "started", "message": "Analyzing news"})
-            start_time = py_time.perf_counter()
-            news_task = asyncio.create_task(
-                get_news_and_analyze(company_name=company_info["name"], ticker_symbol=ticker)
-            )
+        # step 3: news and analyze
+        yield {"step": "news", "status": "started", "message": "Analyzing news"}
+        start_time = py_time.perf_counter()
+        news_progress = ProgressChannel("news")
+        news_task = asyncio.create_task(
+            get_news_and_analyze(company_name=company_info["name"], ticker_symbol=ticker, progress=news_progress)
+        )
 
-            while not news_task.done():
-                yield send_sse_message({"step": "heartbeat", "status": "processing", "message": "still analyzing news..."})
-                await asyncio.sleep(5) # Wait for 5 seconds
+        async for message in news_progress.stream(news_task, settings.SSE_HEARTBEAT_INTERVAL, "still analyzing news..."):
+            yield message
 
-            news_data = {}
-            try:
-                news_data = news_task.result()
-            except Exception as e:
-                logger.error(f"Error during news analysis for {ticker}: {e}", exc_info=True)
-                yield send_sse_message({"step": "news", "status": "error", "message": f"Failed during news analysis: {e}"})
-                return
+        news_data = {}
+        try:
+            news_data = news_task.result()
+        except Exception as e:
+            logger.error(f"Error during news analysis for {ticker}: {e}", exc_info=True)
+            yield {"step": "news", "status": "error", "message": f"Failed during news analysis: {e}"}
+            return
 
-            elapsed_time = py_time.perf_counter() - start_time
-            yield send_sse_message({"step": "news", "status": "success", "message": f"Found and analyzed {len(news_data['articles'])} articles in {elapsed_time:.2f} seconds"})
+        elapsed_time = py_time.perf_counter() - start_time
+        PIPELINE_STAGE_SECONDS.labels("news").observe(elapsed_time)
+        yield {"step": "news", "status": "success", "message": f"Found and analyzed {len(news_data['articles'])} articles in {elapsed_time:.2f} seconds"}
 
-            # step 4: expand keywords and generate queries
-            yield send_sse_message({"step": "keywords", "status": "started", "message": "Expanding keywords"})
+        # step 4: expand keywords and generate queries
+        yield {"step": "keywords", "status": "started", "message": "Expanding keywords"}
+        with PIPELINE_STAGE_SECONDS.labels("keywords").time():
             expanded_data = await expand_keywords_and_generate_queries(company_info['name'], company_info.get('industry', 'N/A'))
-            yield send_sse_message({"step": "keywords", "status": "success", "message": "Generated search queries"})
+        yield {"step": "keywords", "status": "success", "message": "Generated search queries"}
+
+        # step 5: scrape social media
+        yield {"step": "social", "status": "started", "message": "Analyzing social media"}
+        start_time = py_time.perf_counter()
 
-            # step 5: scrape social media
-            yield send_sse_message({"step": "social", "status": "started", "message": "Analyzing social media"})
-            start_time = py_time.perf_counter()
+        social_progress = ProgressChannel("social")
+        social_task = asyncio.create_task(
+            scrape_social_media(company_name=company_info['name'], search_queries=expanded_data['search_queries'], progress=social_progress)
+        )
 
-            social_task = asyncio.create_task(
-                scrape_social_media(company_name=company_info['name'], search_queries=expanded_data['search_queries'])
-            )
+        async for message in social_progress.stream(social_task, settings.SSE_HEARTBEAT_INTERVAL, "still analyzing social media..."):
+            yield message
+
+        social_data = {}
+        try:
+            social_data = social_task.result()
+        except Exception as e:
+            logger.error(f"Error during social media analysis for {ticker}: {e}", exc_info=True)
+            yield {"step": "social", "status": "error", "message": f"Failed during social analysis: {e}"}
+            return
+
+        elapsed_time = py_time.perf_counter() - start_time
+        PIPELINE_STAGE_SECONDS.labels("social").observe(elapsed_time)
+        yield {"step": "social", "status": "success", "message": f"Found and analyzed {social_data['total_posts']} posts in {elapsed_time:.2f} seconds"}
+
+        # step 6: calculate metrics
+        yield {"step": "calculate", "status": "started", "message": "Calculating metrics"}
+        with PIPELINE_STAGE_SECONDS.labels("calculate").time():
+            scores = await cpu_pool.run(calculate_metrics, financial_data, news_data, social_data)
+            scores["sentiment_model"] = sentiment_batcher.model_version()
+        yield {"step": "calculate", "status": "success", "message": "Calculated metrics"}
+
+        # step 7: save to db
+        result = {
+            "ticker": ticker,
+            "company_info": company_info,
+            "financial_data": financial_data,
+            "news_data": news_data,
+            "expanded_data": expanded_data,
+            "social_data": social_data,
+            "scores": scores,
+            "last_run": now_utc.isoformat(),
+        }
 
-            while not social_task.done():
-                yield send_sse_message({"step": "heartbeat", "status": "processing", "message": "still analyzing social media..."})
-                await asyncio.sleep(5)
-            
-            social_data = {}
+        with PIPELINE_STAGE_SECONDS.labels("save").time():
+            # Items go in before `data` points at the new run and old runs go after, so a reader never gets an empty page
+            history_saved, items_saved = await asyncio.gather(
+                record_scores(ticker, scores, financial_data.get("current_price"), result["last_run"]),
+                save_items(ticker, result["last_run"], news_data, social_data),
+                return_exceptions=True,
+            )
+            if isinstance(history_saved, Exception):
+                logger.error(f"Failed to record score history for {ticker}: {history_saved}")
+            if isinstance(items_saved, Exception):
+                logger.error(f"Failed to store scored items for {ticker}: {items_saved}")
+            await _upsert("data", result)
             try:
-                social_data = social_task.result()
+                await prune_items(ticker, result["last_run"])
             except Exception as e:
-                logger.error(f"Error during social media analysis for {ticker}: {e}", exc_info=True)
-                yield send_sse_message({"step": "social", "status": "error", "message": f"Failed during social analysis: {e}"})
-                return
+                logger.error(f"Failed to prune old scored items for {ticker}: {e}")
+        yield {"step": "complete", "status": "success", "data": result}
+
+    except Exception as e:
+        logger.error(f"Error in analysis pipeline for {ticker}: {e}", exc_info=True)
+        yield {"step": "complete", "status": "error", "message": str(e), "data": None}
+    finally:
+        if ticket is not None:
+            ticket.close()
 
-            elapsed_time = py_time.perf_counter() - start_time
-            yield send_sse_message({"step": "social", "status": "success", "message": f"Found and analyzed {social_data['total_posts']} posts in {elapsed_time:.2f} seconds"})
-
-            # step 6: calculate metrics
-            yield send_sse_message({"step": "calculate", "status": "started", "message": "Calculating metrics"})
-            scores = calculate_metrics(financial_data, news_data, social_data)
-            yield send_sse_message({"step": "calculate", "status": "success", "message": "Calculated metrics"})
-
-            # step 7: save to db
-            result = {
-                "ticker": ticker,
-                "company_info": company_info,
-                "financial_data": financial_data,
-                "news_data": news_data,
-                "expanded_data": expanded_data,
-                "social_data": social_data,
-                "scores": scores,
-                "last_run": now_utc.isoformat(),
-            }
-            
-            await _upsert("data", result)
-            yield send_sse_message({"step": "complete", "status": "success", "data": result})
 
+def stream_response(chunks, request: Request, media_type: str = "text/event-stream"):
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no",
+        "Vary": "Accept-Encoding",
+    }
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        chunks = gzip_stream(chunks)
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+async def shape_messages(messages: AsyncGenerator[dict, None], profile: str = "full", sections: Optional[List[str]] = None) -> AsyncGenerator[dict, None]:
+    # The slim profile sends the summary with cache/complete events and each detail section as its own event.
+    # A stale cache row gets its details too: the client shows it as the interim result while the re-run goes.
+    async for message in messages:
+        if profile != "slim" or not message.get("data") or message.get("step") not in ("cache", "complete"):
+            yield message
+            continue
+        result = message["data"]
+        yield {**message, "data": slim_result(result)}
+        for section in sections or DETAIL_SECTIONS:
+            if section in DETAIL_SECTIONS:
+                yield {"step": "detail", "status": "success", "section": section, "data": detail_section(result, section)}
+
+
+admission = AdmissionController(settings.ANALYZE_MAX_CONCURRENCY, settings.ANALYZE_MAX_QUEUE)
+
+@app.post("/analyze")
+async def analyze(data: AnalyzeItem, request: Request):
+    if not data or not data.symbol:
+        raise HTTPException(status_code=400, detail="No symbol provided")
+    ticker = data.symbol.upper()
+    force_refresh = data.force_refresh
+    logger.info(f"Starting analysis for {ticker} (force_refresh={force_refresh})")
+
+    async def generate() -> AsyncGenerator[str, None]:
+        messages = analysis_pipeline(ticker, force_refresh=force_refresh, admission=admission)
+        async for message in shape_messages(messages, data.profile, data.sections):
+            yield send_sse_message(message)
+
+    return stream_response(generate(), request)
+
+
+batch_semaphore = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+
+@app.post("/analyze/batch")
+async def analyze_batch(data: BatchAnalyzeItem, request: Request):
+    tickers = list(dict.fromkeys(s.strip().upper() for s in (data.symbols if data else []) if s and s.strip()))
+    if not tickers:
+        raise HTTPException(status_code=400, detail="No symbols provided")
+    if len(tickers) > settings.BATCH_MAX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_SYMBOLS} symbols per batch")
+    force_refresh = data.force_refresh
+    ndjson = data.format == "ndjson"
+    encode = send_ndjson_message if ndjson else send_sse_message
+    logger.info(f"Starting batch analysis for {len(tickers)} tickers (force_refresh={force_refresh})")
+
+    async def generate() -> AsyncGenerator[str, None]:
+        tasks = []
+        try:
+            yield encode({"step": "batch", "status": "started", "tickers": tickers})
+            session = app.state.aiohttp_session
+
+            cache_result = await _select("data", in_filters=[("ticker", tickers)])
+            cached_rows = {row["ticker"]: row for row in (cache_result.data or [])}
+            now_utc = datetime.now(timezone.utc)
+            stale = [
+                t for t in tickers
+                if force_refresh or t not in cached_rows
+                or not cache_is_fresh(cached_rows[t], now_utc)
+            ]
+
+            # Shared work for every ticker that needs a fresh run
+            financials, _ = await asyncio.gather(
+                get_financial_data_batch(stale, period="2mo"),
+                company_index.prefetch(stale, session),
+            )
+            queue: asyncio.Queue = asyncio.Queue()
+
+            async def run(ticker):
+                try:
+                    async with batch_semaphore:
+                        messages = analysis_pipeline(
+                            ticker,
+                            force_refresh=force_refresh,
+                            cached_row=cached_rows.get(ticker, {}),
+                            financial_data=financials.get(ticker),
+                        )
+                        async for message in shape_messages(messages, data.profile):
+                            await queue.put({"ticker": ticker, **message})
+                finally:
+                    await queue.put(None)
+
+            tasks = [asyncio.create_task(run(t)) for t in tickers]
+            remaining = len(tasks)
+            while remaining:
+                message = await queue.get()
+                if message is None:
+                    remaining -= 1
+                    continue
+                yield encode(message)
+
+            yield encode({"step": "batch", "status": "success", "tickers": tickers})
         except Exception as e:
-            logger.error(f"Error in /analyze pipeline: {e}", exc_info=True)
-            yield send_sse_message({"step": "complete", "status": "error", "message": str(e), "data": None})
-
-    return StreamingResponse(
-        generate(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
+            logger.error(f"Error in /analyze/batch pipeline: {e}", exc_info=True)
+            yield encode({"step": "batch", "status": "error", "message": str(e)})
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return stream_response(generate(), request, media_type="application/x-ndjson" if ndjson else "text/event-stream")
+
+
+job_store = JobStore(settings.JOBS_DB_PATH)
+
+@app.post("/jobs")
+async def submit_job(data: AnalyzeItem):
+    if not data or not data.symbol:
+        raise HTTPException(status_code=400, detail="No symbol provided")
+    job = await job_store.submit(data.symbol.upper(), force_refresh=data.force_refresh)
+    logger.info(f"Queued analysis job {job['id']} for {job['ticker']}")
+    return {"job_id": job["id"], "status": job["status"]}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request, after: int = 0):
+    if not await job_store.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+
+    async def generate() -> AsyncGenerator[str, None]:
+        async for seq, message in job_store.follow(job_id, after=after):
+            yield send_sse_message(message, event_id=seq)
+
+    return stream_response(generate(), request)
+
+
+@app.get("/analysis/{ticker}/detail/{section}")
+async def get_analysis_detail(ticker: str, section: str):
+    if section not in DETAIL_SECTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown section: {section}")
+    result = await _select("data", filters=[("ticker", ticker.upper())], limit=1)
+    if not result.data:
+        raise HTTPException(status_code=404, detail="No analysis found")
+    return {"ticker": ticker.upper(), "section": section, "data": detail_section(result.data[0], section)}
+
+@app.get("/analysis/{ticker}/{kind}")
+async def list_scored_items(ticker: str, kind: str, platform: Optional[str] = None, label: Optional[str] = None, min_engagement: Optional[int] = None, sort: str = "recent", order: str = "desc", limit: int = 20, cursor: Optional[str] = None):
+    if kind not in ("articles", "posts"):
+        raise HTTPException(status_code=404, detail=f"Unknown item kind: {kind}")
+    if sort not in SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_COLUMNS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    try:
+        page = await page_items(ticker.upper(), kind, platform, label, min_engagement, sort, order == "desc", limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StaleCursor as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=404, detail="No analysis found")
+    return page
+
+@app.get("/history/{ticker}")
+async def get_score_history(ticker: str, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    history = await load_history(ticker, start, end)
+    return {"ticker": ticker.upper(), "count": len(history), "history": history_to_records(history)}
+
+@app.get("/backtest/{ticker}")
+async def backtest_signals(ticker: str, start: Optional[datetime] = None, end: Optional[datetime] = None, horizon: List[int] = Query([1, 5]), threshold_confidence: float = 0.6, positive_threshold: float = 60, negative_threshold: float = 40):
+    from backtest import run_backtest
+
+    return await run_backtest(
+        ticker, start, end, horizon,
+        threshold_confidence=threshold_confidence, positive_threshold=positive_threshold, negative_threshold=negative_threshold,
     )
 
+@app.get("/search")
+async def search_symbols(q: str, limit: int = 10):
+    results = symbol_index.search(q, limit=max(1, min(limit, 50)))
+    return {"count": len(results), "result": results}
 
 @app.get("/company/{ticker}")
 async def get_company(ticker: str):
@@ -561,15 +850,23 @@ async def get_financial_data_route(ticker_symbol: str):
 
 @app.get("/news/{ticker}")
 async def get_news_and_analyze_route(ticker: str):
+    # Served from the latest stored analysis; only tickers never analyzed are scored on demand
+    news = await stored_news(ticker.upper())
+    if news is not None:
+        return news
     return await get_news_and_analyze(ticker_symbol=ticker)
 
 @app.get("/trending")
 async def get_alpha_vantage_trending_route():
     return await get_alpha_vantage_trending()
 
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/health")
 async def health_check():
-    return {"success": True}
+    return {"success": True, "sentiment_service": sentiment_batcher.healthy}
 
 @app.head("/health")
 async def health_head():
@@ -0,0 +1,148 @@
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from config import settings
+
+EASTERN = ZoneInfo("America/New_York")
+REGULAR_OPEN = time(9, 30)
+REGULAR_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+# One-off closures that no rule can derive (national days of mourning, etc.)
+ADHOC_CLOSURES = {date(2018, 12, 5), date(2025, 1, 9)}
+
+
+def easter(year: int) -> date:
+    # Anonymous Gregorian algorithm
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    return date(year, month, (h + l - 7 * m + 114) % 31 + 1)
+
+def nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+def last_weekday(year: int, month: int, weekday: int) -> date:
+    last = (date(year, month + 1, 1) if month < 12 else date(year + 1, 1, 1)) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def observed(day: date) -> date:
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+def nyse_holidays(year: int) -> set:
+    holidays = {
+        nth_weekday(year, 1, 0, 3),           # Martin Luther King Jr. Day
+        nth_weekday(year, 2, 0, 3),           # Washington's Birthday
+        easter(year) - timedelta(days=2),     # Good Friday
+        last_weekday(year, 5, 0),             # Memorial Day
+        observed(date(year, 7, 4)),
+        nth_weekday(year, 9, 0, 1),           # Labor Day
+        nth_weekday(year, 11, 3, 4),          # Thanksgiving
+        observed(date(year, 12, 25)),
+    }
+    # New Year's Day falling on a Saturday is not observed on the preceding Friday
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(observed(new_year))
+    if year >= 2022:
+        holidays.add(observed(date(year, 6, 19)))
+    return holidays | {d for d in ADHOC_CLOSURES if d.year == year}
+
+def nyse_early_closes(year: int, holidays: set) -> set:
+    candidates = {
+        date(year, 7, 3),
+        nth_weekday(year, 11, 3, 4) + timedelta(days=1),  # Day after Thanksgiving
+        date(year, 12, 24),
+    }
+    return {d for d in candidates if d.weekday() < 5 and d not in holidays}
+
+
+class MarketCalendar:
+    # NYSE regular sessions, precomputed per year as sorted UTC timestamps so lookups are a bisect
+    def __init__(self):
+        self._years: Dict[int, Tuple[List[float], List[float]]] = {}
+
+    def _sessions(self, year: int) -> Tuple[List[float], List[float]]:
+        sessions = self._years.get(year)
+        if sessions is None:
+            holidays = nyse_holidays(year)
+            early = nyse_early_closes(year, holidays)
+            opens, closes = [], []
+            day = date(year, 1, 1)
+            while day.year == year:
+                if day.weekday() < 5 and day not in holidays:
+                    opens.append(datetime.combine(day, REGULAR_OPEN, EASTERN).timestamp())
+                    closes.append(datetime.combine(day, EARLY_CLOSE if day in early else REGULAR_CLOSE, EASTERN).timestamp())
+                day += timedelta(days=1)
+            sessions = self._years[year] = (opens, closes)
+        return sessions
+
+    def is_trading_day(self, day: date) -> bool:
+        return self.session(day) is not None
+
+    def session(self, day: date) -> Optional[Tuple[datetime, datetime]]:
+        opens, closes = self._sessions(day.year)
+        start = datetime.combine(day, REGULAR_OPEN, EASTERN).timestamp()
+        i = bisect_right(opens, start) - 1
+        if i < 0 or opens[i] != start:
+            return None
+        return datetime.fromtimestamp(opens[i], timezone.utc), datetime.fromtimestamp(closes[i], timezone.utc)
+
+    def is_open(self, now: Optional[datetime] = None) -> bool:
+        ts = (now or datetime.now(timezone.utc)).timestamp()
+        opens, closes = self._sessions(datetime.fromtimestamp(ts, EASTERN).year)
+        i = bisect_right(opens, ts) - 1
+        return i >= 0 and ts < closes[i]
+
+    def next_open(self, now: Optional[datetime] = None) -> datetime:
+        ts = (now or datetime.now(timezone.utc)).timestamp()
+        year = datetime.fromtimestamp(ts, EASTERN).year
+        for y in (year, year + 1):
+            opens, _ = self._sessions(y)
+            i = bisect_right(opens, ts)
+            if i < len(opens):
+                return datetime.fromtimestamp(opens[i], timezone.utc)
+        raise ValueError("No session found within a year")
+
+    def last_close(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        ts = (now or datetime.now(timezone.utc)).timestamp()
+        year = datetime.fromtimestamp(ts, EASTERN).year
+        for y in (year, year - 1):
+            _, closes = self._sessions(y)
+            i = bisect_right(closes, ts) - 1
+            if i >= 0:
+                return datetime.fromtimestamp(closes[i], timezone.utc)
+        return None
+
+    def quote_refresh_delay(self, now: Optional[datetime] = None) -> float:
+        # Poll at the broadcast interval in session; otherwise sleep until the next open
+        now = now or datetime.now(timezone.utc)
+        if self.is_open(now):
+            return settings.QUOTES_BROADCAST_INTERVAL
+        return max(1.0, (self.next_open(now) - now).total_seconds())
+
+    def analysis_ttl(self, now: Optional[datetime] = None) -> timedelta:
+        now = now or datetime.now(timezone.utc)
+        if self.is_open(now):
+            return timedelta(seconds=settings.ANALYSIS_CACHE_TTL)
+        if self.is_trading_day(now.astimezone(EASTERN).date()):
+            return timedelta(seconds=settings.ANALYSIS_CACHE_TTL_CLOSED)
+        return timedelta(seconds=settings.ANALYSIS_CACHE_TTL_NON_TRADING)
+
+    def is_fresh(self, last_run: str, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now(timezone.utc)
+        return now - datetime.fromisoformat(last_run) < self.analysis_ttl(now)
+
+
+market_calendar = MarketCalendar()
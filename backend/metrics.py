@@ -0,0 +1,53 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+PIPELINE_STAGE_SECONDS = Histogram(
+    "hypr_pipeline_stage_seconds", "Time spent in each /analyze pipeline stage", ["stage"], buckets=LATENCY_BUCKETS
+)
+OUTBOUND_REQUEST_SECONDS = Histogram(
+    "hypr_outbound_request_seconds", "Latency of calls to external providers", ["provider"], buckets=LATENCY_BUCKETS
+)
+DB_CALL_SECONDS = Histogram(
+    "hypr_db_call_seconds", "Latency of Supabase calls", ["table", "operation"], buckets=LATENCY_BUCKETS
+)
+SENTIMENT_BATCH_SIZE = Histogram(
+    "hypr_sentiment_batch_size", "Texts per request sent to the sentiment service", buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+CACHE_LOOKUPS = Counter(
+    "hypr_cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"]
+)
+DUPLICATES_DROPPED = Counter(
+    "hypr_duplicates_dropped_total", "Posts and articles dropped as exact or near duplicates before scoring", ["source"]
+)
+WEBSOCKET_CLIENTS = Gauge(
+    "hypr_websocket_clients", "Connected /ws/popular clients"
+)
+ADMISSION_ACTIVE = Gauge(
+    "hypr_admission_active", "/analyze pipelines currently holding a slot"
+)
+ADMISSION_QUEUED = Gauge(
+    "hypr_admission_queued", "/analyze requests waiting for a slot"
+)
+ADMISSION_DECISIONS = Counter(
+    "hypr_admission_decisions_total", "/analyze admission outcomes", ["outcome"]
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "hypr_admission_wait_seconds", "Time an /analyze request waited for a slot", buckets=LATENCY_BUCKETS
+)
+OFFLOAD_SECONDS = Histogram(
+    "hypr_offload_seconds", "Time to run a CPU-bound stage off the event loop, including queueing", ["function"], buckets=LATENCY_BUCKETS
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "hypr_event_loop_lag_seconds", "How late the event loop ran a scheduled tick",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+STARTUP_SECONDS = Gauge(
+    "hypr_startup_seconds", "Time spent in each startup phase", ["phase"]
+)
+STARTUP_IMPORT_SECONDS = Gauge(
+    "hypr_startup_import_seconds", "Time the warm-up task spent importing each deferred module", ["module"]
+)
+EVENT_LOOP_STALLS = Counter(
+    "hypr_event_loop_stalls_total", "Times a single step held the event loop past the stall threshold"
+)
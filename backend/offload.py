@@ -0,0 +1,71 @@
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+from metrics import OFFLOAD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def preload(modules: Tuple[str, ...]):
+    for module in modules:
+        importlib.import_module(module)
+
+
+class CpuPool:
+    # Process pool for CPU-bound stages so pandas work and large loops never hold the event loop.
+    # Arguments and results are pickled, so only hand it plain data and module-level functions.
+    def __init__(self, workers: Optional[int], preload: Tuple[str, ...] = ()):
+        # With a single core a pool only adds pickling and competes with the loop, so threads are used instead
+        self.workers = workers if workers is not None else min(4, (os.cpu_count() or 1) - 1)
+        self.preload = preload
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._warmup: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.workers > 0 and self._executor is None:
+            # spawn rather than fork: the parent already runs threads (to_thread, Supabase) that fork would copy mid-lock
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            self._warmup = asyncio.get_running_loop().create_task(self._warm())
+
+    async def _warm(self):
+        # Spawned workers start cold; import the heavy modules now rather than during the first analysis
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.gather(*(loop.run_in_executor(self._executor, preload, self.preload) for _ in range(self.workers)))
+            logger.info(f"CPU pool ready with {self.workers} workers")
+        except Exception as e:
+            logger.error(f"CPU pool warm-up failed: {e}")
+
+    def shutdown(self):
+        if self._warmup is not None:
+            self._warmup.cancel()
+            self._warmup = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn, *args):
+        name = getattr(fn, "__name__", "call")
+        start = time.perf_counter()
+        try:
+            executor = self._executor
+            if executor is None:
+                return await asyncio.to_thread(fn, *args)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                # A worker died (OOM, signal). Every call in flight sees this; only the first replaces the pool,
+                # so later ones do not shut down (and cancel work on) the replacement. All finish in a thread.
+                if self._executor is executor:
+                    logger.error(f"CPU pool broke while running {name}; restarting it")
+                    self.shutdown()
+                    self.start()
+                return await asyncio.to_thread(fn, *args)
+        finally:
+            OFFLOAD_SECONDS.labels(name).observe(time.perf_counter() - start)
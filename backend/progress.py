@@ -0,0 +1,30 @@
+import asyncio
+from typing import AsyncGenerator, Optional
+
+
+class ProgressChannel:
+    # Pipeline stages push item-level events here; the SSE stream forwards them as they arrive
+    def __init__(self, step: str):
+        self.step = step
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def emit(self, message: str, **data):
+        self._queue.put_nowait({"step": self.step, "status": "progress", "message": message, **data})
+
+    def _drain(self):
+        while not self._queue.empty():
+            yield self._queue.get_nowait()
+
+    async def stream(self, task: asyncio.Task, heartbeat_interval: float, heartbeat_message: str) -> AsyncGenerator[dict, None]:
+        while True:
+            get: Optional[asyncio.Future] = asyncio.ensure_future(self._queue.get())
+            done, _ = await asyncio.wait({get, task}, timeout=heartbeat_interval, return_when=asyncio.FIRST_COMPLETED)
+            if get in done:
+                yield get.result()
+                continue
+            get.cancel()
+            if task in done:
+                for message in self._drain():
+                    yield message
+                return
+            yield {"step": "heartbeat", "status": "processing", "message": heartbeat_message}
@@ -53,6 +53,37 @@ CREATE TABLE data (
   UNIQUE(ticker, last_run)
 );
 
+-- Append-only: one row per completed analysis, so `data` can keep only the latest result
+CREATE TABLE score_history (
+  id BIGSERIAL PRIMARY KEY,
+  ticker VARCHAR(10) NOT NULL,
+  recorded_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  hype_index REAL,
+  financial_momentum REAL,
+  news_sentiment REAL,
+  news_confidence REAL,
+  social_buzz REAL,
+  social_confidence REAL,
+  sentiment_price_divergence REAL,
+  signal SMALLINT,                      -- 1 = BUY, 0 = HOLD, -1 = SELL
+  price REAL
+);
+
+-- Articles and posts of the latest analysis per ticker, for paged and filtered reads
+CREATE TABLE scored_items (
+  id BIGSERIAL PRIMARY KEY,
+  ticker VARCHAR(10) NOT NULL,
+  run_at TIMESTAMP WITH TIME ZONE NOT NULL,
+  kind VARCHAR(10) NOT NULL,            -- 'article' | 'post'
+  platform TEXT,                        -- Reddit / Bluesky, or the news source
+  label VARCHAR(10),
+  sentiment REAL NOT NULL DEFAULT 0,
+  confidence REAL,
+  engagement INTEGER NOT NULL DEFAULT 0,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+  item JSONB NOT NULL
+);
+
 CREATE TABLE company_info (
   ticker VARCHAR(10) PRIMARY KEY,       -- e.g., AAPL, GOOGL
   name TEXT NOT NULL,
@@ -75,4 +106,7 @@ CREATE INDEX idx_tokens_user_id ON tokens(user_id);
 CREATE INDEX updated_at_idx ON trending_stocks(last_updated);
 CREATE INDEX data_ticker_idx ON data (ticker);
 CREATE INDEX data_last_run_idx ON data (last_run);
-CREATE INDEX company_ticker_idx ON company_info (ticker);
\ No newline at end of file
+CREATE INDEX company_ticker_idx ON company_info (ticker);
+CREATE INDEX score_history_ticker_recorded_at_idx ON score_history (ticker, recorded_at);
+CREATE INDEX scored_items_recent_idx ON scored_items (ticker, kind, run_at, created_at, id);
+CREATE INDEX scored_items_engagement_idx ON scored_items (ticker, kind, run_at, engagement, id);
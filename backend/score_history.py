@@ -0,0 +1,84 @@
+import math
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from database import _insert, _select_all
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SCORE_COLUMNS = (
+    "hype_index",
+    "financial_momentum",
+    "news_sentiment",
+    "news_confidence",
+    "social_buzz",
+    "social_confidence",
+    "sentiment_price_divergence",
+)
+SIGNAL_CODES = {"BUY": 1, "HOLD": 0, "SELL": -1}
+SIGNAL_NAMES = {code: name for name, code in SIGNAL_CODES.items()}
+# Trading signal inputs with the fallback used when a component is missing, and the live thresholds
+SIGNAL_INPUTS = {
+    "financial_momentum": 50.0,
+    "news_sentiment": 50.0,
+    "news_confidence": 0.5,
+    "social_buzz": 0.0,
+    "social_confidence": 0.5,
+    "sentiment_price_divergence": 0.0,
+}
+SIGNAL_THRESHOLDS = {"threshold_confidence": 0.6, "positive_threshold": 60.0, "negative_threshold": 40.0}
+HISTORY_COLUMNS = ",".join(("recorded_at", *SCORE_COLUMNS, "signal", "price"))
+
+
+def signal_code(financial_momentum, news_sentiment, news_confidence, social_buzz, social_confidence, sentiment_price_divergence,
+                threshold_confidence: float = 0.6, positive_threshold: float = 60, negative_threshold: float = 40):
+    # 1 / 0 / -1. Only arithmetic, comparisons and & are used, so the live signal (floats) and the
+    # backtest (whole numpy columns) run the same rule
+    composite = (
+        financial_momentum * 0.6 +
+        news_sentiment * 0.2 * news_confidence +
+        social_buzz * 0.2 * social_confidence
+    )
+    confident = (news_confidence + social_confidence + 1.0) / 3.0 >= threshold_confidence
+    buy = confident & (composite >= positive_threshold) & (sentiment_price_divergence < 0)
+    sell = confident & (composite <= negative_threshold) & (sentiment_price_divergence > 0)
+    return 1 * buy - 1 * sell
+
+def score_row(ticker: str, scores: Dict[str, Any], price: Optional[float], recorded_at: str) -> Dict[str, Any]:
+    row = {"ticker": ticker, "recorded_at": recorded_at, "signal": SIGNAL_CODES.get(scores.get("trading_signal"), 0), "price": price}
+    for column in SCORE_COLUMNS:
+        value = scores.get(column)
+        row[column] = float(value) if value is not None and math.isfinite(value) else None
+    return row
+
+async def record_scores(ticker: str, scores: Dict[str, Any], price: Optional[float], recorded_at: str):
+    await _insert("score_history", score_row(ticker, scores, price, recorded_at))
+
+def rows_to_frame(rows: List[dict]) -> "pd.DataFrame":
+    import numpy as np
+    import pandas as pd
+
+    df = pd.DataFrame(rows, columns=HISTORY_COLUMNS.split(","))
+    df["recorded_at"] = pd.to_datetime(df["recorded_at"], utc=True)
+    df = df.set_index("recorded_at").sort_index()
+    df[list(SCORE_COLUMNS) + ["price"]] = df[list(SCORE_COLUMNS) + ["price"]].astype(np.float32)
+    df["signal"] = df["signal"].fillna(0).astype(np.int8)
+    return df
+
+async def load_history(ticker: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> "pd.DataFrame":
+    range_filters = []
+    if start:
+        range_filters.append(("recorded_at", "gte", start.isoformat()))
+    if end:
+        range_filters.append(("recorded_at", "lt", end.isoformat()))
+    rows = await _select_all(
+        "score_history", HISTORY_COLUMNS, order="recorded_at",
+        filters=[("ticker", ticker.upper())], range_filters=range_filters,
+    )
+    return rows_to_frame(rows)
+
+def history_to_records(df: "pd.DataFrame") -> List[dict]:
+    out = df.reset_index()
+    out["recorded_at"] = out["recorded_at"].map(lambda ts: ts.isoformat())
+    out["trading_signal"] = out.pop("signal").map(SIGNAL_NAMES)
+    return out.astype(object).where(out.notna(), None).to_dict(orient="records")
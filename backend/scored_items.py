@@ -0,0 +1,153 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from database import _delete, _insert, _select
+
+# Articles and posts of the latest analysis, one row each, so the detail views can be paged,
+# filtered and sorted in the database instead of shipping the whole `data` row.
+
+KINDS = {"articles": "article", "posts": "post"}
+SORT_COLUMNS = {"recent": "created_at", "engagement": "engagement", "sentiment": "sentiment"}
+ITEM_COLUMNS = "id,item,created_at,engagement,sentiment"
+MAX_PAGE_SIZE = 100
+
+
+class StaleCursor(Exception):
+    pass
+
+
+def item_rows(ticker: str, run_at: str, news_data: Dict[str, Any], social_data: Dict[str, Any]) -> List[dict]:
+    rows = []
+    for article in news_data.get("articles") or []:
+        rows.append({
+            "ticker": ticker, "run_at": run_at, "kind": "article",
+            "platform": article.get("source"),
+            "label": article.get("label"),
+            "sentiment": article.get("sentiment", 0),
+            "confidence": article.get("confidence"),
+            "engagement": 0,
+            "created_at": article.get("published_at") or run_at,
+            "item": article,
+        })
+    for post in social_data.get("posts") or []:
+        rows.append({
+            "ticker": ticker, "run_at": run_at, "kind": "post",
+            "platform": post.get("platform"),
+            "label": post.get("label"),
+            "sentiment": post.get("sentiment", 0),
+            "confidence": post.get("confidence"),
+            "engagement": int(post.get("engagement") or 0),
+            "created_at": post.get("created_at") or run_at,
+            "item": post,
+        })
+    return rows
+
+async def save_items(ticker: str, run_at: str, news_data: Dict[str, Any], social_data: Dict[str, Any]):
+    # Inserted before `data` points at run_at, so readers never see a run whose items are missing
+    rows = item_rows(ticker, run_at, news_data, social_data)
+    if rows:
+        await _insert("scored_items", rows)
+
+async def prune_items(ticker: str, run_at: str):
+    # Readers only see the run recorded in `data`, so older runs can go once it points at the new one
+    await _delete("scored_items", filters=[("ticker", ticker)], range_filters=[("run_at", "lt", run_at)])
+
+
+def encode_cursor(run_at: str, value: Any, item_id: int) -> str:
+    raw = json.dumps([run_at, value, item_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        run_at, value, item_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return run_at, value, int(item_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def keyset_filter(column: str, value: Any, item_id: int, descending: bool) -> str:
+    op = "lt" if descending else "gt"
+    quoted = json.dumps(str(value))
+    return f"{column}.{op}.{quoted},and({column}.eq.{quoted},id.{op}.{item_id})"
+
+async def latest_run(ticker: str) -> Optional[str]:
+    result = await _select("data", "last_run", filters=[("ticker", ticker)], limit=1)
+    return result.data[0]["last_run"] if result.data else None
+
+async def has_items(ticker: str, run_at: str) -> bool:
+    result = await _select("scored_items", "id", filters=[("ticker", ticker), ("run_at", run_at)], limit=1)
+    return bool(result.data)
+
+async def legacy_rows(ticker: str, run_at: str, kind: str) -> List[dict]:
+    # Runs stored before scored_items existed, or whose item insert failed, only have the lists in `data`
+    column = "news_data->articles" if kind == "articles" else "social_data->posts"
+    result = await _select("data", f"items:{column}", filters=[("ticker", ticker)], limit=1)
+    items = (result.data[0].get("items") if result.data else None) or []
+    news_data, social_data = ({"articles": items}, {}) if kind == "articles" else ({}, {"posts": items})
+    rows = item_rows(ticker, run_at, news_data, social_data)
+    for item_id, row in enumerate(rows, 1):
+        row["id"] = item_id
+    return rows
+
+def filter_rows(rows: List[dict], column: str, descending: bool, platform: Optional[str] = None, label: Optional[str] = None, min_engagement: Optional[int] = None, after: Optional[tuple] = None) -> List[dict]:
+    # In-memory equivalent of the page query, for legacy rows
+    def key(row):
+        return (row[column], row["id"])
+    rows = [
+        row for row in rows
+        if (not platform or row["platform"] == platform)
+        and (not label or row["label"] == label)
+        and (min_engagement is None or row["engagement"] >= min_engagement)
+        and (after is None or (key(row) < after if descending else key(row) > after))
+    ]
+    return sorted(rows, key=key, reverse=descending)
+
+async def page_items(ticker: str, kind: str, platform: Optional[str] = None, label: Optional[str] = None, min_engagement: Optional[int] = None, sort: str = "recent", descending: bool = True, limit: int = 20, cursor: Optional[str] = None) -> Optional[dict]:
+    run_at = await latest_run(ticker)
+    if run_at is None:
+        return None
+    column = SORT_COLUMNS[sort]
+    or_filter = after = None
+    if cursor:
+        cursor_run, value, item_id = decode_cursor(cursor)
+        if datetime.fromisoformat(cursor_run) != datetime.fromisoformat(run_at):
+            raise StaleCursor("Analysis was refreshed; restart from the first page")
+        or_filter = keyset_filter(column, value, item_id, descending)
+        after = (value, item_id)
+
+    filters = [("ticker", ticker), ("kind", KINDS[kind]), ("run_at", run_at)]
+    if platform:
+        filters.append(("platform", platform))
+    if label:
+        filters.append(("label", label))
+    range_filters = [("engagement", "gte", min_engagement)] if min_engagement is not None else None
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    result = await _select(
+        "scored_items", ITEM_COLUMNS, filters=filters, range_filters=range_filters, or_filter=or_filter,
+        order=[column, "id"], desc=descending, limit=limit + 1,
+    )
+    rows = result.data or []
+    if not rows and not await has_items(ticker, run_at):
+        rows = filter_rows(await legacy_rows(ticker, run_at, kind), column, descending, platform, label, min_engagement, after)[:limit + 1]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(run_at, last[column], last["id"])
+    return {"ticker": ticker, "run_at": run_at, "items": [row["item"] for row in rows], "next_cursor": next_cursor}
+
+async def stored_news(ticker: str) -> Optional[dict]:
+    # Same shape as get_news_and_analyze, read back from the latest analysis
+    result = await _select("data", "last_run,avg_sentiment:news_data->avg_sentiment", filters=[("ticker", ticker)], limit=1)
+    if not result.data:
+        return None
+    run_at = result.data[0]["last_run"]
+    articles = await _select(
+        "scored_items", "item", filters=[("ticker", ticker), ("kind", "article"), ("run_at", run_at)],
+        order=["created_at", "id"], desc=True,
+    )
+    rows = articles.data or []
+    if not rows and not await has_items(ticker, run_at):
+        rows = filter_rows(await legacy_rows(ticker, run_at, "articles"), "created_at", descending=True)
+    return {"articles": [row["item"] for row in rows], "avg_sentiment": result.data[0].get("avg_sentiment") or 0}
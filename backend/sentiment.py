@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import re
+from typing import Dict, List, Optional, Set, Tuple
+import aiohttp
+from config import settings
+from metrics import OUTBOUND_REQUEST_SECONDS, SENTIMENT_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+NEUTRAL = (0.0, "neutral", 0.5)
+
+def clean_text(text: str) -> str:
+    clean = re.sub(r"http\S+", "", text or "")
+    clean = re.sub(r"@\w+", "", clean).strip()
+    return clean[:512]
+
+def scores_to_sentiment(items: List[dict]) -> Tuple[float, str, float]:
+    if not items:
+        return NEUTRAL
+    scores = {item["label"]: item["score"] for item in items}
+    pos = scores.get("positive", 0)
+    neg = scores.get("negative", 0)
+    neu = scores.get("neutral", 0)
+    sentiment = pos - neg
+    if sentiment > 0.1:
+        label = "positive"
+    elif sentiment < -0.1:
+        label = "negative"
+    else:
+        label = "neutral"
+    confidence = max(pos, neg, neu)
+    return sentiment, label, confidence
+
+
+class SentimentBatcher:
+    # Coalesces concurrent analyze() calls into batched requests to the sentiment service, one queue per model
+    def __init__(self, max_batch_size: int = 32, max_wait: float = 0.01):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.model_versions: Dict[str, str] = {}
+        self.healthy: Optional[bool] = None
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        self._flush_handles: Dict[str, asyncio.TimerHandle] = {}
+        self._sends: Set[asyncio.Task] = set()  # strong references so in-flight sends are not garbage collected
+
+    def model_version(self, model: Optional[str] = None) -> Optional[str]:
+        # Version last reported by the service for this model; None until it has answered once
+        return self.model_versions.get(model or settings.SENTIMENT_ANALYZER_MODEL)
+
+    async def probe(self, attempts: int, delay: float = 1.0, max_delay: float = 30.0) -> bool:
+        # Startup health check, retried with backoff in the background so a cold service never holds up startup
+        for attempt in range(1, attempts + 1):
+            try:
+                async with self.session.get(settings.SENTIMENT_ANALYZER_URL + "/health") as resp:
+                    if resp.status == 200 and (await resp.json()).get("success"):
+                        self.healthy = True
+                        logger.info("Sentiment analyzer service healthy.")
+                        return True
+                    logger.warning(f"Sentiment analyzer service not ready (status {resp.status}, attempt {attempt}/{attempts})")
+            except Exception as e:
+                logger.warning(f"Could not reach sentiment analyzer service (attempt {attempt}/{attempts}): {e}")
+            if attempt < attempts:
+                await asyncio.sleep(min(delay * 2 ** (attempt - 1), max_delay))
+        self.healthy = False
+        logger.error(f"Sentiment analyzer service still unavailable after {attempts} attempts")
+        return False
+
+    async def analyze(self, text: str, model: Optional[str] = None) -> Tuple[float, str, float]:
+        clean = clean_text(text)
+        if not clean:
+            return NEUTRAL
+        model = model or settings.SENTIMENT_ANALYZER_MODEL
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.setdefault(model, [])
+        pending.append((clean, future))
+        if len(pending) >= self.max_batch_size:
+            self._flush(model)
+        elif model not in self._flush_handles:
+            self._flush_handles[model] = asyncio.get_running_loop().call_later(self.max_wait, self._flush, model)
+        return await future
+
+    def _flush(self, model: str):
+        handle = self._flush_handles.pop(model, None)
+        if handle is not None:
+            handle.cancel()
+        batch = self._pending.pop(model, [])
+        if batch:
+            SENTIMENT_BATCH_SIZE.observe(len(batch))
+            task = asyncio.create_task(self._send(model, batch))
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+
+    async def _send(self, model: str, batch: List[Tuple[str, asyncio.Future]]):
+        results = [NEUTRAL] * len(batch)
+        try:
+            if self.session is None:
+                raise RuntimeError("HTTP session is not initialized")
+            payload = {"texts": [text for text, _ in batch], "model": model}
+            with OUTBOUND_REQUEST_SECONDS.labels("sentiment").time():
+                async with self.session.post(settings.SENTIMENT_ANALYZER_URL + "/analyze/batch", json=payload) as resp:
+                    if resp.status == 200:
+                        body = await resp.json()
+                        if body.get("version"):
+                            self.model_versions[model] = body["version"]
+                        data = body.get("data") or []
+                        results = [scores_to_sentiment(items) for items in data] + results[len(data):]
+                    else:
+                        logger.error(f"Sentiment analyzer /analyze/batch returned status {resp.status}")
+        except Exception as e:
+            logger.error(f"Error analyzing sentiment for batch of {len(batch)} texts. Error: {e}")
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+sentiment_batcher = SentimentBatcher()
@@ -0,0 +1,152 @@
+import asyncio
+import base64
+import json
+import logging
+import time
+from typing import Dict, Optional, Tuple
+import aiohttp
+from config import settings
+from metrics import CACHE_LOOKUPS, OUTBOUND_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Long-lived social clients shared by every analysis. The Reddit client is created on first use
+# (the worker entry point opens it eagerly) and the Bluesky session logs in once, so later
+# pipeline runs never pay for client setup or a login.
+
+TOKEN_EXPIRY_MARGIN = 60
+FALLBACK_ACCESS_TTL = 15 * 60  # used when the access token has no readable exp claim
+LOGIN_RETRY_BACKOFF = 30
+
+
+def reddit_client():
+    import asyncpraw
+
+    return asyncpraw.Reddit(client_id=settings.REDDIT_CLIENT_ID, client_secret=settings.REDDIT_CLIENT_SECRET, user_agent=settings.REDDIT_USER_AGENT, oauth_url=settings.REDDIT_OAUTH_URL, reddit_url=settings.REDDIT_URL)
+
+def jwt_expiry(token: str) -> Optional[float]:
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except Exception:
+        return None
+
+
+class BlueskySession:
+    # Caches the access JWT and renews it with the refresh JWT; the password is only sent when both are unusable
+    def __init__(self):
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._access: Optional[str] = None
+        self._access_expires = 0.0
+        self._refresh: Optional[str] = None
+        self._refresh_expires = 0.0
+        self._retry_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _store(self, data: dict):
+        self._access = data.get("accessJwt")
+        self._refresh = data.get("refreshJwt")
+        now = time.time()
+        self._access_expires = jwt_expiry(self._access or "") or now + FALLBACK_ACCESS_TTL
+        self._refresh_expires = jwt_expiry(self._refresh or "") or float("inf")
+        if not self._access:
+            raise RuntimeError("Bluesky auth failed: no access token received")
+
+    async def _post(self, method: str, **kwargs) -> dict:
+        with OUTBOUND_REQUEST_SECONDS.labels("bluesky").time():
+            async with self.session.post(f"{settings.BLUESKY_API_URL}/{method}", **kwargs) as resp:
+                resp.raise_for_status()
+                return await resp.json()
+
+    async def _renew(self):
+        if self._refresh and time.time() < self._refresh_expires - TOKEN_EXPIRY_MARGIN:
+            try:
+                self._store(await self._post("com.atproto.server.refreshSession", headers={"Authorization": f"Bearer {self._refresh}"}))
+                CACHE_LOOKUPS.labels("bluesky_session", "refresh").inc()
+                return
+            except Exception as e:
+                logger.warning(f"Bluesky session refresh failed, logging in again: {e}")
+        self._store(await self._post("com.atproto.server.createSession", json={"identifier": settings.BSKY_IDENTIFIER, "password": settings.BSKY_PASSWORD}))
+        CACHE_LOOKUPS.labels("bluesky_session", "login").inc()
+
+    async def headers(self) -> Dict[str, str]:
+        if self.session is None:
+            raise RuntimeError("HTTP session is not initialized")
+        if self._access and time.time() < self._access_expires - TOKEN_EXPIRY_MARGIN:
+            CACHE_LOOKUPS.labels("bluesky_session", "hit").inc()
+            return {"Authorization": f"Bearer {self._access}"}
+        async with self._lock:
+            if not self._access or time.time() >= self._access_expires - TOKEN_EXPIRY_MARGIN:
+                # After a failed login, fail fast for a while instead of hammering createSession
+                if time.time() < self._retry_at:
+                    raise RuntimeError("Bluesky login failed recently; retrying later")
+                try:
+                    await self._renew()
+                except Exception:
+                    self._retry_at = time.time() + LOGIN_RETRY_BACKOFF
+                    raise
+        return {"Authorization": f"Bearer {self._access}"}
+
+    def invalidate(self, headers: Dict[str, str]):
+        # Called on a 401; only drops the token if nobody has replaced it already
+        if headers.get("Authorization") == f"Bearer {self._access}":
+            self._access_expires = 0.0
+
+
+class RedditConnector:
+    def __init__(self):
+        self._client = None
+        self._subreddits: Dict[str, Tuple[bool, float]] = {}
+        self._lookups: Dict[str, asyncio.Future] = {}
+
+    @property
+    def client(self):
+        # Created on first use so importing asyncpraw stays off the startup path
+        if self._client is None:
+            self._client = reddit_client()
+        return self._client
+
+    def start(self):
+        self.client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def _lookup(self, name: str) -> bool:
+        from asyncprawcore.exceptions import BadRequest, Forbidden, NotFound, Redirect
+
+        try:
+            with OUTBOUND_REQUEST_SECONDS.labels("reddit").time():
+                await self.client.subreddit(name, fetch=True)
+            return True
+        except (BadRequest, Forbidden, NotFound, Redirect):
+            return False
+
+    async def subreddit_exists(self, name: str) -> bool:
+        name = name.lower()
+        cached = self._subreddits.get(name)
+        if cached and time.monotonic() - cached[1] < settings.SUBREDDIT_CACHE_TTL:
+            CACHE_LOOKUPS.labels("subreddit", "hit").inc()
+            return cached[0]
+        CACHE_LOOKUPS.labels("subreddit", "miss").inc()
+
+        # Concurrent analyses of the same company share one lookup
+        future = self._lookups.get(name)
+        if future is None:
+            future = self._lookups[name] = asyncio.ensure_future(self._lookup(name))
+            future.add_done_callback(lambda f: self._lookups.pop(name, None))
+        try:
+            exists = await asyncio.shield(future)
+        except Exception as e:
+            # Transient failures are not cached
+            logger.warning(f"Subreddit lookup for r/{name} failed: {e}")
+            return False
+        self._subreddits[name] = (exists, time.monotonic())
+        return exists
+
+
+bluesky_session = BlueskySession()
+reddit_connector = RedditConnector()
@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+import importlib
+import logging
+import subprocess
+import sys
+import time
+from typing import Iterable, List, Tuple
+from metrics import STARTUP_IMPORT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Modules the request paths import lazily. The app starts serving without them and a
+# warm-up task loads them right after, so the first analysis does not pay for them either.
+HEAVY_MODULES = ("supabase", "pandas", "yfinance", "asyncpraw", "openai")  # roughly in the order requests need them
+
+
+async def warm_imports(modules: Iterable[str] = HEAVY_MODULES):
+    loaded = []
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(importlib.import_module, name)
+        except Exception as e:
+            logger.warning(f"Warm-up could not import {name}: {e}")
+            continue
+        cost = time.perf_counter() - start
+        STARTUP_IMPORT_SECONDS.labels(name).set(cost)
+        loaded.append(f"{name} {cost * 1000:.0f} ms")
+    logger.info(f"Warm-up imported {', '.join(loaded) or 'nothing'}")
+
+
+def profile_imports(module: str = "main", depth: int = 1) -> List[Tuple[float, float, str]]:
+    # Runs `python -X importtime` on a fresh interpreter; returns (cumulative ms, self ms, name) down to `depth`
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"import {module} failed")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # header line
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        if level <= depth:
+            rows.append((int(cumulative_us) / 1000, int(self_us) / 1000, name.rstrip()))
+    return sorted(rows, reverse=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report what importing the backend costs, heaviest modules first")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--depth", type=int, default=1, help="nesting level of imports to include")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    rows = profile_imports(args.module, args.depth)
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for cumulative, own, name in rows[:args.top]:
+        print(f"{cumulative:9.1f} ms {own:7.1f} ms  {name}")
@@ -0,0 +1,123 @@
+import csv
+import logging
+import re
+from bisect import bisect_left, insort
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SYMBOLS_FILE = Path(__file__).parent / "data" / "symbols.csv"
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def normalize(text: str) -> str:
+    return " ".join(_TOKEN_RE.findall((text or "").lower()))
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymbolSearchIndex:
+    def __init__(self):
+        self._entries: Dict[str, dict] = {}
+        self._prefix_keys: List[Tuple[str, str]] = []  # sorted (key, ticker)
+        self._keys_by_ticker: Dict[str, List[Tuple[str, str]]] = {}
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self._trigrams_by_ticker: Dict[str, Set[str]] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, ticker: str):
+        for key in self._keys_by_ticker.pop(ticker, []):
+            i = bisect_left(self._prefix_keys, key)
+            if i < len(self._prefix_keys) and self._prefix_keys[i] == key:
+                del self._prefix_keys[i]
+        for gram in self._trigrams_by_ticker.pop(ticker, set()):
+            self._trigrams[gram].discard(ticker)
+        self._entries.pop(ticker, None)
+
+    def add(self, ticker: str, name: str, type: str = "Common Stock"):
+        ticker = (ticker or "").upper()
+        if not ticker:
+            return
+        name = name or ticker
+        existing = self._entries.get(ticker)
+        if existing and existing["description"] == name.upper():
+            return
+        self._remove(ticker)
+
+        self._entries[ticker] = {
+            "description": name.upper(),
+            "displaySymbol": ticker,
+            "symbol": ticker,
+            "type": type,
+        }
+        norm_ticker, norm_name = ticker.lower(), normalize(name)
+        keys = {(norm_ticker, ticker), (norm_name, ticker)}
+        keys.update((token, ticker) for token in norm_name.split())
+        self._keys_by_ticker[ticker] = sorted(keys)
+        for key in keys:
+            insort(self._prefix_keys, key)
+
+        grams = trigrams(norm_ticker) | trigrams(norm_name)
+        self._trigrams_by_ticker[ticker] = grams
+        for gram in grams:
+            self._trigrams[gram].add(ticker)
+
+    def add_company_rows(self, rows: List[dict]):
+        for row in rows:
+            self.add(row.get("ticker"), row.get("name"))
+
+    def load_bundled(self, path: Path = SYMBOLS_FILE):
+        try:
+            with open(path, newline="") as f:
+                for row in csv.DictReader(f):
+                    self.add(row["symbol"], row["name"], row.get("type") or "Common Stock")
+        except FileNotFoundError:
+            logger.warning(f"Bundled symbol list not found at {path}")
+
+    def _prefix_matches(self, prefix: str, limit: int) -> List[str]:
+        matches = []
+        i = bisect_left(self._prefix_keys, (prefix, ""))
+        while i < len(self._prefix_keys) and len(matches) < limit:
+            key, ticker = self._prefix_keys[i]
+            if not key.startswith(prefix):
+                break
+            if ticker not in matches:
+                matches.append(ticker)
+            i += 1
+        return matches
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        norm_query = normalize(query)
+        if not norm_query:
+            return []
+
+        ranked: Dict[str, float] = {}
+        raw_query = query.strip().lower()
+        if raw_query.upper() in self._entries:
+            ranked[raw_query.upper()] = 3.0
+        for ticker in self._prefix_matches(raw_query, limit * 4):
+            ranked.setdefault(ticker, 2.0 if ticker.lower().startswith(raw_query) else 1.5)
+        for ticker in self._prefix_matches(norm_query, limit * 4):
+            ranked.setdefault(ticker, 1.5)
+
+        if len(ranked) < limit and len(norm_query) >= 3:
+            query_grams = trigrams(norm_query)
+            overlap: Dict[str, int] = defaultdict(int)
+            for gram in query_grams:
+                for ticker in self._trigrams.get(gram, ()):
+                    overlap[ticker] += 1
+            for ticker, count in overlap.items():
+                similarity = count / len(query_grams | self._trigrams_by_ticker[ticker])
+                if similarity >= 0.2:
+                    ranked.setdefault(ticker, similarity)
+
+        ordered = sorted(ranked.items(), key=lambda item: (-item[1], len(item[0]), item[0]))
+        return [self._entries[ticker] for ticker, _ in ordered[:limit]]
+
+
+symbol_index = SymbolSearchIndex()
@@ -0,0 +1,41 @@
+import asyncio
+import logging
+import aiohttp
+from config import settings
+from jobs import run_worker, run_reaper, worker_name
+from main import app, analysis_pipeline, job_store, cpu_pool
+from company_index import company_index
+from sentiment import sentiment_batcher
+from social import bluesky_session, reddit_connector
+
+# Standalone analysis workers; run with JOB_WORKERS=0 on API replicas to scale them separately
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def main(workers: int):
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+        app.state.aiohttp_session = session
+        sentiment_batcher.session = session
+        bluesky_session.session = session
+        reddit_connector.start()
+        cpu_pool.start()
+        try:
+            await company_index.load()
+        except Exception as e:
+            logger.error(f"Could not load company index: {e}")
+
+        tasks = [run_reaper(job_store, settings.JOB_STALE_AFTER, settings.JOB_RETENTION, settings.JOB_MAX_ATTEMPTS)]
+        tasks += [run_worker(job_store, worker_name(i), analysis_pipeline) for i in range(workers)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            cpu_pool.shutdown()
+            await reddit_connector.close()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run Hypr analysis job workers")
+    parser.add_argument("--workers", type=int, default=max(settings.JOB_WORKERS, 1))
+    args = parser.parse_args()
+    asyncio.run(main(args.workers))
@@ -0,0 +1,48 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Deterministic stand-in for the parts of yfinance the backend uses
+
+PERIOD_DAYS = {"1mo": 22, "2mo": 43, "3mo": 64, "6mo": 127, "1y": 252}
+
+def _history(symbol: str, period: str = "2mo", auto_adjust: bool = True) -> pd.DataFrame:
+    days = PERIOD_DAYS.get(period, 43)
+    seed = int(hashlib.md5(symbol.encode()).hexdigest()[:8], 16)
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, days)))
+    open_ = close * (1 + rng.normal(0, 0.005, days))
+    index = pd.bdate_range(end=pd.Timestamp("2025-10-10"), periods=days, tz="America/New_York")
+    frame = pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) * 1.01,
+        "Low": np.minimum(open_, close) * 0.99,
+        "Close": close,
+        "Volume": rng.integers(1_000_000, 50_000_000, days).astype(float),
+    }, index=index)
+    if auto_adjust:
+        return frame
+    # Every symbol paid a 2% dividend ten sessions ago; raw bars before it sit above the adjusted ones
+    raw = frame.copy()
+    raw.iloc[:-10, :4] /= 0.98
+    raw["Adj Close"] = close
+    return raw
+
+
+class Ticker:
+    def __init__(self, symbol: str):
+        self.ticker = symbol.upper()
+        self.info = {"longBusinessSummary": f"{self.ticker} is a benchmark company."}
+
+    def history(self, period: str = "2mo", interval: str = "1d", auto_adjust: bool = True, **kwargs):
+        return _history(self.ticker, period, auto_adjust)
+
+
+def download(tickers, period: str = "2mo", interval: str = "1d", group_by: str = "column", auto_adjust: bool = True, ignore_tz=None, **kwargs):
+    # Like yfinance, daily downloads drop the timezone unless ignore_tz=False
+    symbols = tickers.split() if isinstance(tickers, str) else list(tickers)
+    frames = {symbol: _history(symbol, period, auto_adjust) for symbol in symbols}
+    result = pd.concat(frames, axis=1)
+    if ignore_tz if ignore_tz is not None else interval.endswith(("d", "wk", "mo")):
+        result.index = result.index.tz_localize(None)
+    return result
@@ -0,0 +1,22 @@
+import os
+import sys
+from pathlib import Path
+
+# Runs the backend against the provider fakes; yfinance is replaced in-process since it cannot be pointed at a URL.
+# The market is held open so quote broadcasts run at QUOTES_BROADCAST_INTERVAL whatever the wall-clock time.
+
+BENCH_DIR = Path(__file__).parent
+BACKEND_DIR = BENCH_DIR.parent / "backend"
+
+if __name__ == "__main__":
+    import uvicorn
+
+    sys.path[:0] = [str(BACKEND_DIR), str(BENCH_DIR)]
+    import fake_yfinance
+    sys.modules["yfinance"] = fake_yfinance
+    os.chdir(BACKEND_DIR)
+    from market_calendar import market_calendar
+    market_calendar.is_open = lambda now=None: True
+    from main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=int(os.environ.get("PORT", 8000)), log_level="warning")
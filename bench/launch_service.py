@@ -0,0 +1,37 @@
+import os
+import sys
+import time
+import types
+from pathlib import Path
+
+# Runs the sentiment service with a tiny fake model in place of transformers
+
+BENCH_DIR = Path(__file__).parent
+SERVICE_DIR = BENCH_DIR.parent / "service"
+PER_TEXT_COST = float(os.environ.get("FAKE_MODEL_COST", 0.002))
+
+def pipeline(task, model=None, **kwargs):
+    from fakes import fake_sentiment
+
+    def analyzer(texts, batch_size=1, truncation=False, **call_kwargs):
+        single = isinstance(texts, str)
+        batch = [texts] if single else texts
+        time.sleep(PER_TEXT_COST * len(batch))  # stands in for per-text inference cost
+        results = [fake_sentiment(text) for text in batch]
+        return [results[0]] if single else results
+
+    # Just enough of a transformers model for the service's memory accounting and versioning
+    analyzer.model = types.SimpleNamespace(
+        parameters=lambda: [], buffers=lambda: [], config=types.SimpleNamespace(_commit_hash=f"fake{abs(hash(model)):x}"),
+    )
+    return analyzer
+
+if __name__ == "__main__":
+    import uvicorn
+
+    sys.path[:0] = [str(SERVICE_DIR), str(BENCH_DIR)]
+    sys.modules["transformers"] = types.SimpleNamespace(pipeline=pipeline)
+    os.chdir(SERVICE_DIR)
+    from main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=int(os.environ.get("PORT", 8001)), log_level="warning")
@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import aiohttp
+from aiohttp import web
+from fakes import backend_env, create_app, parse_latency
+
+# Benchmark harness: starts the provider fakes, launches the backend and sentiment service
+# against them, runs the load scenarios and compares the results with a stored baseline.
+
+BENCH_DIR = Path(__file__).parent
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+SCENARIOS = ("analyze", "cache_storm", "popular", "ws_fanout", "sentiment")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+def summarize(latencies: List[float], errors: int, elapsed: float, rss_kb: int) -> dict:
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "peak_rss_mb": round(rss_kb / 1024, 1),
+    }
+
+def peak_rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class Process:
+    def __init__(self, script: str, port: int, env: Dict[str, str]):
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.proc = subprocess.Popen(
+            [sys.executable, str(BENCH_DIR / script)],
+            env={**os.environ, **env, "PORT": str(port)},
+        )
+
+    async def wait_healthy(self, session: aiohttp.ClientSession, timeout: float = 60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"{self.url} exited with {self.proc.returncode}")
+            try:
+                async with session.get(f"{self.url}/health") as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+        raise TimeoutError(f"{self.url} did not become healthy")
+
+    def peak_rss_kb(self) -> int:
+        return peak_rss_kb(self.proc.pid)
+
+    def stop(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+async def timed_requests(concurrency: int, total: int, request) -> tuple:
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await request(i)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors += 1
+                print(f"  request {i} failed: {e}", file=sys.stderr)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies, errors, time.perf_counter() - start
+
+async def read_analysis(session: aiohttp.ClientSession, url: str, payload: dict):
+    async with session.post(url, json=payload) as resp:
+        resp.raise_for_status()
+        async for line in resp.content:
+            if line.startswith(b"data:"):
+                message = json.loads(line[5:])
+                if message.get("step") == "complete":
+                    if message.get("status") != "success":
+                        raise RuntimeError(message.get("message"))
+                    return message
+    raise RuntimeError("stream ended without a complete event")
+
+
+async def scenario_analyze(session, backend: Process, args) -> dict:
+    tickers = [f"B{i:03d}" for i in range(args.concurrency)]
+    latencies, errors, elapsed = await timed_requests(
+        args.concurrency, args.concurrency,
+        lambda i: read_analysis(session, f"{backend.url}/analyze", {"symbol": tickers[i], "force_refresh": True}),
+    )
+    return summarize(latencies, errors, elapsed, backend.peak_rss_kb())
+
+async def scenario_cache_storm(session, backend: Process, args) -> dict:
+    await read_analysis(session, f"{backend.url}/analyze", {"symbol": "AAPL", "force_refresh": True})
+    latencies, errors, elapsed = await timed_requests(
+        args.concurrency, args.requests,
+        lambda i: read_analysis(session, f"{backend.url}/analyze", {"symbol": "AAPL"}),
+    )
+    return summarize(latencies, errors, elapsed, backend.peak_rss_kb())
+
+async def scenario_popular(session, backend: Process, args) -> dict:
+    async def get(i):
+        async with session.get(f"{backend.url}/popular") as resp:
+            resp.raise_for_status()
+            await resp.read()
+
+    latencies, errors, elapsed = await timed_requests(args.concurrency, args.requests, get)
+    return summarize(latencies, errors, elapsed, backend.peak_rss_kb())
+
+async def scenario_ws_fanout(session, backend: Process, args) -> dict:
+    # Each client gets a snapshot on connect; once all K hold one, time until each receives the next broadcast
+    connected = asyncio.Event()
+    ready = 0
+    latencies, errors = [], 0
+
+    async def client(i):
+        nonlocal ready, errors
+        try:
+            async with session.ws_connect(f"{backend.url.replace('http', 'ws')}/ws/popular") as ws:
+                await asyncio.wait_for(ws.receive_json(), timeout=30)
+                ready += 1
+                if ready == args.clients:
+                    connected.set()
+                await asyncio.wait_for(connected.wait(), timeout=30)
+                start = time.perf_counter()
+                while True:
+                    message = await asyncio.wait_for(ws.receive_json(), timeout=30)
+                    if message.get("type") == "quotes":
+                        latencies.append(time.perf_counter() - start)
+                        return
+        except Exception as e:
+            errors += 1
+            connected.set()
+            print(f"  client {i} failed: {e}", file=sys.stderr)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(args.clients)))
+    return summarize(latencies, errors, time.perf_counter() - start, backend.peak_rss_kb())
+
+async def scenario_sentiment(session, service: Process, args) -> dict:
+    # Unique texts per request so the service's result cache does not short-circuit inference
+    async def post(i):
+        texts = [f"ACME beats estimates and raises guidance, request {i} item {j}" for j in range(args.batch_size)]
+        async with session.post(f"{service.url}/analyze/batch", json={"texts": texts}) as resp:
+            resp.raise_for_status()
+            await resp.read()
+
+    latencies, errors, elapsed = await timed_requests(args.concurrency, args.requests, post)
+    return summarize(latencies, errors, elapsed, service.peak_rss_kb())
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    regressions = []
+    for scenario, result in results.items():
+        base = baseline.get(scenario)
+        if not base:
+            continue
+        for key in ("p50_ms", "p99_ms", "peak_rss_mb"):
+            if base.get(key) and result[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{scenario}.{key}: {result[key]} > {base[key]} (+{tolerance:.0%})")
+        if base.get("throughput_rps") and result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{scenario}.throughput_rps: {result['throughput_rps']} < {base['throughput_rps']} (-{tolerance:.0%})")
+        if result["errors"] > base.get("errors", 0):
+            regressions.append(f"{scenario}.errors: {result['errors']} > {base.get('errors', 0)}")
+    return regressions
+
+async def main(args) -> int:
+    runner = web.AppRunner(create_app(parse_latency(args.latency)))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.fakes_port).start()
+    fakes_url = f"http://127.0.0.1:{args.fakes_port}"
+
+    env = {**backend_env(fakes_url), "QUOTES_BROADCAST_INTERVAL": "1", "JOB_WORKERS": "0", "JOBS_DB_PATH": str(Path(tempfile.mkdtemp()) / "jobs.db")}
+    backend = Process("launch_backend.py", args.backend_port, env)
+    service: Optional[Process] = Process("launch_service.py", args.service_port, {}) if "sentiment" in args.scenarios else None
+    results = {}
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=120)) as session:
+            await backend.wait_healthy(session)
+            if service:
+                await service.wait_healthy(session)
+            for scenario in args.scenarios:
+                print(f"Running {scenario}...")
+                target = service if scenario == "sentiment" else backend
+                results[scenario] = await globals()[f"scenario_{scenario}"](session, target, args)
+                print(f"  {json.dumps(results[scenario])}")
+    finally:
+        backend.stop()
+        if service:
+            service.stop()
+        await runner.cleanup()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    if args.update_baseline:
+        BASELINE_FILE.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline written to {BASELINE_FILE}")
+        return 0
+    if not BASELINE_FILE.exists():
+        print("No baseline stored; run with --update-baseline to create one.")
+        return 0
+
+    regressions = compare(results, json.loads(BASELINE_FILE.read_text()), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Hypr backend and sentiment service against local fakes")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent analyses / requests in flight")
+    parser.add_argument("--requests", type=int, default=200, help="requests for cache_storm, popular and sentiment")
+    parser.add_argument("--clients", type=int, default=100, help="WebSocket clients for ws_fanout")
+    parser.add_argument("--batch-size", type=int, default=32, help="texts per sentiment batch request")
+    parser.add_argument("--latency", action="append", default=["default=0.02", "openai=0.3", "sentiment=0.01"], help="provider=seconds of simulated latency")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--fakes-port", type=int, default=9100)
+    parser.add_argument("--backend-port", type=int, default=9101)
+    parser.add_argument("--service-port", type=int, default=9102)
+    sys.exit(asyncio.run(main(parser.parse_args())))
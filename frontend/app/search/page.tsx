@@ -47,7 +47,7 @@ export default function SymbolSearch() {
     setIsLoading(true)
     setError(null)
     try {
-      const url = `https://finnhub.io/api/v1/search?q=${encodeURIComponent(searchText)}&token=${process.env.NEXT_PUBLIC_FINNHUB_API_KEY}`
+      const url = `${process.env.NEXT_PUBLIC_BACKEND_URL}/search?q=${encodeURIComponent(searchText)}&limit=7`
       const response = await fetch(url)
       if (!response.ok) throw new Error("Failed to fetch results")
       const data = await response.json()
@@ -64,7 +64,7 @@ export default function SymbolSearch() {
     if (debounceTimer.current) clearTimeout(debounceTimer.current)
     debounceTimer.current = setTimeout(() => {
       fetchResults(query)
-    }, 800)
+    }, 150)
 
     return () => {
       if (debounceTimer.current) clearTimeout(debounceTimer.current)
@@ -5,7 +5,7 @@ import { TrendingUp, TrendingDown } from "lucide-react"
 function FeedTabs({ data }: { data: any }) {
   const [activeTab, setActiveTab] = useState<"news" | "social">("news")
   const listRef = useRef<HTMLDivElement>(null)
-  const feed = activeTab === "news" ? data.news_data.articles : data.social_data.posts.sort((a: any, b: any) => new Date(b.created_at).getTime() - new Date(a.created_at).getTime())
+  const feed = activeTab === "news" ? (data.news_data?.articles ?? []) : [...(data.social_data?.posts ?? [])].sort((a: any, b: any) => new Date(b.created_at).getTime() - new Date(a.created_at).getTime())
 
   useLayoutEffect(() => {
     if (listRef.current) {
@@ -3,7 +3,7 @@ import { useState } from "react"
 
 export interface AnalysisStep {
   step: string
-  status: "started" | "processing" | "success" | "error" | "warning"
+  status: "started" | "processing" | "progress" | "waiting" | "success" | "error" | "warning"
   message: string
   data?: any
 }
@@ -64,6 +64,20 @@ export interface AnalysisData {
   social_data: {
     total_posts: number
     avg_sentiment: number
+    posts?: Array<any>
+  }
+}
+
+const mergeDetail = (data: AnalysisData, section: string, detail: any): AnalysisData => {
+  switch (section) {
+    case "historical_data":
+      return { ...data, financial_data: { ...data.financial_data, historical_data: detail } }
+    case "articles":
+      return { ...data, news_data: { ...data.news_data, articles: detail } }
+    case "posts":
+      return { ...data, social_data: { ...data.social_data, posts: detail } }
+    default:
+      return data
   }
 }
 
@@ -100,7 +114,7 @@ export const useSSEAnalysis = (ticker: string) => {
           headers: {
             "Content-Type": "application/json",
           },
-          body: JSON.stringify({ symbol: ticker, force_refresh: forceRefresh }),
+          body: JSON.stringify({ symbol: ticker, force_refresh: forceRefresh, profile: "slim" }),
         }
       )
 
@@ -128,6 +142,7 @@ export const useSSEAnalysis = (ticker: string) => {
         while (boundary !== -1) {
           const rawEvent = buffer.slice(0, boundary).trim()
           buffer = buffer.slice(boundary + 2)
+          boundary = buffer.indexOf("\n\n")
 
           if (rawEvent) {
             const lines = rawEvent.split("\n")
@@ -138,6 +153,10 @@ export const useSSEAnalysis = (ticker: string) => {
                 const jsonString = dataLine.replace(/^data:\s*/, "")
                 const data = JSON.parse(jsonString)
                 if(data.step === "heartbeat") continue
+                if (data.step === "detail") {
+                  setFinalData((prev) => (prev ? mergeDetail(prev, data.section, data.data) : prev))
+                  continue
+                }
 
                 setSteps((prev) => {
                   const existing = prev.find((s) => s.step === data.step)
@@ -164,7 +183,8 @@ export const useSSEAnalysis = (ticker: string) => {
                   setIsLoading(false)
                   setIsCache(true)
                 } else if (data.step === "complete" && data.status === "success") {
-                  setIsCache(false)
+                  // stale is set when the server was too busy to re-run and sent the cached analysis instead
+                  setIsCache(Boolean(data.stale))
                   try {
                     let finalParsedData = data.data
                     if (typeof data.data === "string") {
@@ -179,7 +199,6 @@ export const useSSEAnalysis = (ticker: string) => {
                     console.error("Failed to parse complete finalData JSON:", e)
                   }
                   setIsLoading(false)
-                  break
                 } else if (data.status === "error") {
                   setError(data.message)
                   setIsLoading(false)
@@ -191,8 +210,6 @@ export const useSSEAnalysis = (ticker: string) => {
               }
             }
           }
-
-          boundary = buffer.indexOf("\n\n")
         }
       }
     } catch (err) {
@@ -1,62 +1,130 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, Histogram, generate_latest
 from pydantic import BaseModel
 from contextlib import asynccontextmanager
 from transformers import pipeline
 import os
+from typing import List, Optional
+import asyncio
 import logging
 import time
+from models import ResultCache, registry_from_env
 
 logger = logging.getLogger(__name__)
-sentiment_analyzer = None
+BATCH_SIZE = int(os.environ.get("BATCH_SIZE", 16))
+inference_lock = asyncio.Lock()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+INFERENCE_BATCH_SIZE = Histogram("sentiment_inference_batch_size", "Texts per inference call", buckets=(1, 2, 4, 8, 16, 32, 64))
+INFERENCE_QUEUE_WAIT_SECONDS = Histogram("sentiment_inference_queue_wait_seconds", "Time a request waits for the model", buckets=LATENCY_BUCKETS)
+INFERENCE_SECONDS = Histogram("sentiment_inference_seconds", "Model inference time per call", ["model"], buckets=LATENCY_BUCKETS)
 
 class TextIn(BaseModel):
     text: str
+    model: Optional[str] = None
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    global sentiment_analyzer
-    os.environ["TOKENIZERS_PARALLELISM"] = "false"
-    model_name = os.environ.get("MODEL_NAME", "ProsusAI/finbert")
-    logger.info(f"Loading sentiment analysis model {model_name}...")
-    sentiment_analyzer = pipeline(
+class TextsIn(BaseModel):
+    texts: List[str]
+    model: Optional[str] = None
+
+def load_pipeline(model_id: str):
+    return pipeline(
         "sentiment-analysis",
-        model=model_name,
+        model=model_id,
         device=-1,
         top_k=None
     )
+
+registry = registry_from_env(load_pipeline)
+result_cache = ResultCache(int(os.environ.get("RESULT_CACHE_SIZE", 20000)))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    # Other registered models load on their first request
+    loaded = await registry.acquire()
+    registry.release(loaded)
     logger.info("Model loaded successfully")
     yield
 
 app = FastAPI(lifespan=lifespan)
 
+async def run_inference(pipe, model_name: str, texts, **kwargs):
+    # One inference at a time, off the event loop; the wait for the lock is the queue wait
+    queued_at = time.perf_counter()
+    async with inference_lock:
+        INFERENCE_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued_at)
+        INFERENCE_BATCH_SIZE.observe(len(texts) if isinstance(texts, list) else 1)
+        with INFERENCE_SECONDS.labels(model_name).time():
+            return await asyncio.to_thread(pipe, texts, **kwargs)
+
+async def analyze_texts(texts: List[str], model: Optional[str]):
+    try:
+        loaded = await registry.acquire(model)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {model}")
+    try:
+        results = [result_cache.get(loaded.version, text) for text in texts]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            inferred = await run_inference(loaded.pipe, loaded.name, [texts[i] for i in missing], batch_size=BATCH_SIZE, truncation=True)
+            for i, result in zip(missing, inferred):
+                results[i] = result
+                result_cache.put(loaded.version, texts[i], result)
+        return loaded, results
+    finally:
+        registry.release(loaded)
+
 @app.get("/health")
 def health():
     return {
-        "success": sentiment_analyzer is not None
+        "success": registry.is_loaded()
     }
 
 @app.head("/health")
 def health_head():
     return
 
+@app.get("/models")
+def list_models():
+    return {
+        "default": registry.default,
+        "memory_budget_bytes": registry.memory_budget,
+        "memory_used_bytes": registry.used_bytes,
+        "models": registry.describe()
+    }
+
 @app.post("/analyze")
 async def analyse(input: TextIn):
-    global sentiment_analyzer
-    if sentiment_analyzer is None:
+    loaded, results = await analyze_texts([input.text], input.model)
+    return {
+        "success": True,
+        "model": loaded.name,
+        "version": loaded.version,
+        "data": results
+    }
+
+@app.post("/analyze/batch")
+async def analyse_batch(input: TextsIn):
+    if not input.texts:
         return {
-            "success": False,
-            "message": "Model not loaded"
+            "success": True,
+            "data": []
         }
-    start_time = time.perf_counter()
-    results = sentiment_analyzer(input.text)
-    end_time = time.perf_counter()
-    print(f"Analysis completed in {end_time - start_time:.2f} seconds")
+    loaded, results = await analyze_texts(input.texts, input.model)
     return {
         "success": True,
+        "model": loaded.name,
+        "version": loaded.version,
         "data": results
     }
 
+@app.get("/metrics")
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run("main:app", host="0.0.0.0", port=int(os.environ.get("PORT", 8001)), reload=False)
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=int(os.environ.get("PORT", 8001)), reload=False)
@@ -0,0 +1,167 @@
+import asyncio
+import gc
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+MODEL_LOAD_SECONDS = Histogram("sentiment_model_load_seconds", "Time to load a model", ["model"], buckets=(1, 2.5, 5, 10, 30, 60, 120, 300))
+MODELS_LOADED = Gauge("sentiment_models_loaded", "Models currently held in memory")
+MODEL_MEMORY_BYTES = Gauge("sentiment_model_memory_bytes", "Estimated memory held by loaded models")
+MODEL_EVICTIONS = Counter("sentiment_model_evictions_total", "Models unloaded to stay under the memory budget", ["model"])
+RESULT_CACHE_LOOKUPS = Counter("sentiment_result_cache_lookups_total", "Per-text result cache lookups", ["result"])
+
+
+def parse_models(spec: str) -> Dict[str, str]:
+    # "finbert=ProsusAI/finbert,tone=yiyanghkust/finbert-tone"; a bare id is its own name
+    models = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, model_id = entry.partition("=")
+        models[name.strip()] = (model_id or name).strip()
+    return models
+
+def model_bytes(pipe) -> int:
+    model = pipe.model
+    return sum(t.numel() * t.element_size() for t in list(model.parameters()) + list(model.buffers()))
+
+def model_version(name: str, pipe) -> str:
+    revision = getattr(pipe.model.config, "_commit_hash", None)
+    return f"{name}@{revision[:12]}" if revision else name
+
+
+class LoadedModel:
+    def __init__(self, name: str, pipe, size: int):
+        self.name = name
+        self.pipe = pipe
+        self.size = size
+        self.version = model_version(name, pipe)
+        self.in_use = 0
+        self.last_used = time.time()
+
+
+class ModelRegistry:
+    # Lazily loads registered models and unloads the least recently used idle ones to stay under the budget.
+    # The default is never unloaded: /health reports on it and the backend sends it on every request.
+    def __init__(self, models: Dict[str, str], default: str, memory_budget: int, loader):
+        self.models = models
+        self.default = default
+        try:
+            self.default = self.resolve(default)
+        except KeyError:
+            raise ValueError(f"Default model {default} is not registered")
+        self.memory_budget = memory_budget
+        self._loader = loader
+        self._loaded: "OrderedDict[str, LoadedModel]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def resolve(self, name: Optional[str]) -> str:
+        name = name or self.default
+        if name in self.models:
+            return name
+        for alias, model_id in self.models.items():
+            if model_id == name:
+                return alias
+        raise KeyError(name)
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(m.size for m in self._loaded.values())
+
+    def _evict_for(self, needed: int, keep: str):
+        for name in list(self._loaded):
+            if self.used_bytes + needed <= self.memory_budget:
+                break
+            loaded = self._loaded[name]
+            if name in (keep, self.default) or loaded.in_use:
+                continue
+            logger.info(f"Unloading model {name} ({loaded.size / 2**20:.0f} MiB) to stay under the memory budget")
+            del self._loaded[name]
+            MODEL_EVICTIONS.labels(name).inc()
+        gc.collect()
+        self._update_gauges()
+
+    def _update_gauges(self):
+        MODELS_LOADED.set(len(self._loaded))
+        MODEL_MEMORY_BYTES.set(self.used_bytes)
+
+    async def acquire(self, name: Optional[str] = None) -> LoadedModel:
+        name = self.resolve(name)
+        loaded = self._loaded.get(name)
+        if loaded is None:
+            lock = self._locks.setdefault(name, asyncio.Lock())
+            async with lock:
+                loaded = self._loaded.get(name)
+                if loaded is None:
+                    # Make room up front when the size is known from an earlier load
+                    self._evict_for(self._sizes.get(name, 0), keep=name)
+                    logger.info(f"Loading sentiment model {name} ({self.models[name]})...")
+                    with MODEL_LOAD_SECONDS.labels(name).time():
+                        pipe = await asyncio.to_thread(self._loader, self.models[name])
+                    loaded = LoadedModel(name, pipe, model_bytes(pipe))
+                    self._sizes[name] = loaded.size
+                    self._loaded[name] = loaded
+                    self._evict_for(0, keep=name)
+                    logger.info(f"Loaded {loaded.version} ({loaded.size / 2**20:.0f} MiB)")
+        self._loaded.move_to_end(name)
+        loaded.in_use += 1
+        loaded.last_used = time.time()
+        return loaded
+
+    def release(self, loaded: LoadedModel):
+        loaded.in_use -= 1
+
+    def is_loaded(self, name: Optional[str] = None) -> bool:
+        return self.resolve(name) in self._loaded
+
+    def describe(self) -> List[dict]:
+        return [
+            {
+                "name": name,
+                "model_id": model_id,
+                "default": name == self.default,
+                "loaded": name in self._loaded,
+                "version": self._loaded[name].version if name in self._loaded else None,
+                "memory_bytes": self._sizes.get(name),
+                "last_used": self._loaded[name].last_used if name in self._loaded else None,
+            }
+            for name, model_id in self.models.items()
+        ]
+
+
+class ResultCache:
+    # Per-text results keyed by model version, so switching or updating a model never serves stale scores
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], list]" = OrderedDict()
+
+    def get(self, version: str, text: str) -> Optional[list]:
+        result = self._entries.get((version, text))
+        if result is None:
+            RESULT_CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        self._entries.move_to_end((version, text))
+        RESULT_CACHE_LOOKUPS.labels("hit").inc()
+        return result
+
+    def put(self, version: str, text: str, result: list):
+        if self.max_entries <= 0:
+            return
+        self._entries[(version, text)] = result
+        self._entries.move_to_end((version, text))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def registry_from_env(loader) -> ModelRegistry:
+    models = parse_models(os.environ.get("MODELS", ""))
+    if not models:
+        model_id = os.environ.get("MODEL_NAME", "ProsusAI/finbert")
+        models = {model_id: model_id}
+    default = os.environ.get("DEFAULT_MODEL") or os.environ.get("MODEL_NAME") or next(iter(models))
+    budget = int(float(os.environ.get("MODEL_MEMORY_BUDGET_MB", 2048)) * 2**20)
+    return ModelRegistry(models, default, budget, loader)